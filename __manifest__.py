@@ -1,6 +1,6 @@
 {
     'name': 'Account Move Workflow',
-    "version": "saas~18.2.1.0.0",
+    "version": "saas~18.2.1.1.0",
     'category': 'Accounting',
     'summary': 'Define and execute accounting workflow templates',
     'description': """
@@ -23,9 +23,17 @@
     ],
     'data': [
         'security/ir.model.access.csv',
+        'security/security.xml',
+        'data/ir_cron.xml',
         'views/account_move_workflow_views.xml',
+        'views/account_move_workflow_run_views.xml',
+        'views/account_move_workflow_job_views.xml',
+        'views/account_move_workflow_log_views.xml',
+        'views/account_move_workflow_report_views.xml',
         'views/account_move_views.xml',
         'views/account_move_workflow_wizard_views.xml',
+        'views/account_move_workflow_import_views.xml',
+        'views/account_move_workflow_run_reverse_views.xml',
         'views/account_move_workflow_menu.xml',
     ],
     'installable': True,
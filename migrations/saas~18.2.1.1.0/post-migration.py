@@ -0,0 +1,41 @@
+def migrate(cr, version):
+    """Replace the move-to-move relation table by workflow run records.
+
+    Every group of related moves becomes one run, identified by the smallest
+    move id of the group."""
+    cr.execute("SELECT to_regclass('account_move_workflow_rel')")
+    if not cr.fetchone()[0]:
+        return
+
+    cr.execute("""
+        CREATE TEMPORARY TABLE workflow_run_migration_move ON COMMIT DROP AS
+             SELECT move_id, LEAST(move_id, MIN(related_move_id)) AS group_move_id
+               FROM account_move_workflow_rel
+           GROUP BY move_id
+    """)
+    cr.execute("""
+        CREATE TEMPORARY TABLE workflow_run_migration_group ON COMMIT DROP AS
+             SELECT group_move_id, nextval('account_move_workflow_run_id_seq') AS run_id
+               FROM (SELECT DISTINCT group_move_id FROM workflow_run_migration_move) groups
+    """)
+    cr.execute("""
+        INSERT INTO account_move_workflow_run (
+            id, workflow_id, company_id, partner_id, amount, currency_id, date, reference,
+            journal_id, state, create_uid, create_date, write_uid, write_date
+        )
+             SELECT g.run_id, m.workflow_id, m.company_id, m.partner_id, m.amount_total,
+                    m.currency_id, m.date, m.ref, m.journal_id, 'done',
+                    m.create_uid, m.create_date, m.write_uid, m.write_date
+               FROM workflow_run_migration_group g
+               JOIN account_move m ON m.id = g.group_move_id
+              WHERE m.workflow_id IS NOT NULL
+    """)
+    cr.execute("""
+        UPDATE account_move m
+           SET workflow_run_id = g.run_id
+          FROM workflow_run_migration_move mm
+          JOIN workflow_run_migration_group g ON g.group_move_id = mm.group_move_id
+          JOIN account_move_workflow_run r ON r.id = g.run_id
+         WHERE m.id = mm.move_id
+    """)
+    cr.execute("DROP TABLE account_move_workflow_rel")
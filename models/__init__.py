@@ -1,3 +1,8 @@
 from . import account_move
 from . import account_move_workflow_template
+from . import account_move_workflow_run
+from . import account_move_workflow_job
+from . import account_move_workflow_log
+from . import account_move_workflow_trigger
+from . import account_move_workflow_report
 from . import account_move_workflow
\ No newline at end of file
@@ -1,4 +1,10 @@
+import logging
+from collections import defaultdict
+
 from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
 
 
 class AccountMove(models.Model):
@@ -10,17 +16,32 @@ class AccountMove(models.Model):
         readonly=True,
         copy=False,
         index=True,
-        check_company=True
+    )
+    workflow_run_id = fields.Many2one(
+        comodel_name='account.move.workflow.run',
+        string='Workflow Execution',
+        readonly=True,
+        copy=False,
+        index='btree_not_null',
+        ondelete='set null',
     )
     related_move_ids = fields.Many2many(
         comodel_name='account.move',
-        relation='account_move_workflow_rel',
-        column1='move_id',
-        column2='related_move_id',
         string='Related Moves',
         help='Moves related to this one in the same workflow execution',
+        compute='_compute_related_move_ids',
+    )
+    related_move_count = fields.Integer(
+        string='Related Moves Count',
+        compute='_compute_related_move_count',
+    )
+    workflow_template_id = fields.Many2one(
+        comodel_name='account.move.workflow.template',
+        string='Workflow Template Step',
         readonly=True,
-        copy=False
+        copy=False,
+        index='btree_not_null',
+        ondelete='set null',
     )
     workflow_sequence = fields.Integer(
         string='Workflow Sequence',
@@ -29,6 +50,35 @@ class AccountMove(models.Model):
         copy=False,
         index=True
     )
+
+    @api.depends('workflow_run_id.move_ids')
+    def _compute_related_move_ids(self):
+        for move in self:
+            move.related_move_ids = move.workflow_run_id.move_ids - move._origin
+
+    @api.depends('workflow_run_id')
+    def _compute_related_move_count(self):
+        counts = {
+            run.id: count
+            for run, count in self._read_group(
+                domain=[('workflow_run_id', 'in', self.workflow_run_id.ids)],
+                groupby=['workflow_run_id'],
+                aggregates=['__count'],
+            )
+        }
+        for move in self:
+            move.related_move_count = max(counts.get(move.workflow_run_id.id, 0) - 1, 0)
+
+    def action_view_related_moves(self):
+        """Other entries of the workflow execution of this move"""
+        self.ensure_one()
+        action = self.env['ir.actions.act_window']._for_xml_id('account.action_move_journal_line')
+        action.update({
+            'name': _('Related Workflow Entries'),
+            'domain': [('workflow_run_id', '=', self.workflow_run_id.id), ('id', '!=', self.id)],
+            'context': {'create': False},
+        })
+        return action
     
     def action_run_workflow(self):
         """Open wizard to run workflow based on this move"""
@@ -67,13 +117,104 @@ class AccountMove(models.Model):
             'view_mode': 'form',
             'target': 'new',
             'context': {
-                'default_source_move_id': self.id,
-                'default_company_id': self.company_id.id,
-                'default_partner_id': self.partner_id.id if self.partner_id else False,
-                'default_currency_id': self.currency_id.id,
-                'default_amount': self.amount_total,
-                'default_date': self.date,
-                'default_source_move_name': self.name or '',
-                'default_reference': self.ref or self.name or '',
+                'default_%s' % key: value
+                for key, value in self._prepare_workflow_row().items()
             }
-        }
\ No newline at end of file
+        }
+
+    def _prepare_workflow_row(self):
+        """Workflow parameter row using this move as source"""
+        self.ensure_one()
+        return {
+            'source_move_id': self.id,
+            'company_id': self.company_id.id,
+            'partner_id': self.partner_id.id if self.partner_id else False,
+            'currency_id': self.currency_id.id,
+            'amount': self.amount_total,
+            'date': self.date,
+            'source_move_name': self.name or '',
+            'reference': self.ref or self.name or '',
+        }
+
+    def execute_workflow_batch(self, workflow_id, rows=None, post_mode=None):
+        """Run a workflow once for each move of the recordset.
+
+        ``rows`` optionally holds one dict of parameter overrides per move, in
+        the same order as the recordset."""
+        workflow = self.env['account.move.workflow'].browse(workflow_id)
+        workflow.ensure_one()
+        if rows is not None and len(rows) != len(self):
+            raise UserError(_('One parameter row is expected for each journal entry.'))
+
+        not_posted = self.filtered(lambda m: m.state != 'posted')
+        if not_posted:
+            raise UserError(_(
+                'The following journal entries must be posted first: %s'
+            ) % ', '.join(not_posted.mapped('display_name')))
+        generated = self.filtered('workflow_id')
+        if generated:
+            raise UserError(_(
+                'The following entries were already generated from a workflow: %s'
+            ) % ', '.join(generated.mapped('display_name')))
+
+        batch_rows = []
+        for index, move in enumerate(self):
+            row = move._prepare_workflow_row()
+            if rows is not None:
+                row.update(rows[index] or {})
+            batch_rows.append(row)
+        return workflow.execute_batch(batch_rows, post_mode=post_mode)
+
+    def write(self, vals):
+        # The report periods the moves leave must be aggregated again
+        if {'workflow_id', 'date'} & set(vals):
+            self.env['account.move.workflow.report']._mark_dirty(self)
+        return super().write(vals)
+
+    def unlink(self):
+        self.env['account.move.workflow.report']._mark_dirty(self)
+        return super().unlink()
+
+    def _post(self, soft=True):
+        posted = super()._post(soft=soft)
+        if not self.env.context.get('skip_workflow_triggers'):
+            posted._run_workflow_triggers()
+        return posted
+
+    def _run_workflow_triggers(self):
+        """Execute the workflows whose trigger rules match the posted moves,
+        grouped in one batch per workflow.
+
+        Triggers belong to the workflow configuration, not to the user who
+        posts: workflows are executed as superuser and their queued jobs run
+        as the root user. A workflow failing to execute immediately doesn't
+        block the posting: its rows are queued instead, so the error is
+        recorded on them, and a workflow that can't be queued either is only
+        logged."""
+        moves = self.filtered(lambda m: not m.workflow_id)
+        if not moves:
+            return
+        matches = self.env['account.move.workflow.trigger'].sudo()._match_moves(moves)
+        batches = defaultdict(list)
+        for move, rules in matches.items():
+            for workflow_id, mode in {(rule.workflow_id, rule.execution_mode) for rule in rules}:
+                batches[workflow_id, mode].append(move)
+        Workflow = self.env['account.move.workflow'].sudo().with_context(skip_workflow_triggers=True)
+        job_user = self.env.ref('base.user_root')
+        for (workflow_id, mode), batch_moves in batches.items():
+            workflow = Workflow.browse(workflow_id)
+            rows = [move._prepare_workflow_row() for move in batch_moves]
+            if mode == 'immediate':
+                try:
+                    with self.env.cr.savepoint():
+                        workflow._execute_batch(rows)
+                    continue
+                except Exception as e:
+                    _logger.warning(
+                        "Workflow %s triggered by posting failed, its rows are queued: %s", workflow.name, e,
+                    )
+            try:
+                with self.env.cr.savepoint():
+                    workflow._enqueue_batch(rows, user=job_user)
+            except Exception:
+                _logger.exception("Workflow %s triggered by posting could not be queued", workflow.name)
\ No newline at end of file
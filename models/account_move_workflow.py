@@ -1,8 +1,24 @@
 # models/account_move_workflow.py
-from odoo import api, fields, models, _
-from odoo.exceptions import ValidationError
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import defaultdict
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models, tools, _
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import date_utils
 from odoo.tools.safe_eval import safe_eval
 
+_logger = logging.getLogger(__name__)
+
+# First key of the transaction-level advisory lock taken on a workflow while
+# its execution keys are claimed, the second one being the workflow id
+EXECUTION_LOCK_CLASS = 0x57464c
+
 
 class AccountMoveWorkflow(models.Model):
     _name = 'account.move.workflow'
@@ -30,6 +46,67 @@ class AccountMoveWorkflow(models.Model):
         default=lambda self: self.env.company.currency_id,
         help='Default currency for this workflow'
     )
+    post_mode = fields.Selection(
+        selection=[
+            ('immediate', 'Post each entry when created'),
+            ('deferred', 'Post all entries at the end'),
+        ],
+        string='Posting',
+        required=True,
+        default='immediate',
+        help='Deferred posting creates every entry of the execution as draft first '
+             'and posts them all at once at the end, holding the journal sequence '
+             'locks for a shorter time.'
+    )
+    consolidate = fields.Boolean(
+        string='Consolidate Rows',
+        help='Merge the parameter rows of an execution sharing the same '
+             'consolidation key into a single row whose amount is the sum of '
+             'theirs, so each template creates one entry per group instead '
+             'of one per source entry'
+    )
+    consolidate_by_partner = fields.Boolean(string='Group by Partner', default=True)
+    consolidate_by_date = fields.Boolean(string='Group by Date', default=True)
+    consolidate_by_journal = fields.Boolean(string='Group by Journal')
+    recurrence = fields.Selection(
+        selection=[
+            ('daily', 'Daily'),
+            ('monthly', 'Monthly'),
+            ('month_end', 'End of Month'),
+        ],
+        string='Recurrence',
+        help='Execute the workflow automatically with the default parameters '
+             'below once per period'
+    )
+    recurrence_day = fields.Integer(
+        string='Day of Month',
+        default=1,
+        help='Day of the month of monthly executions, the last day of the '
+             'month being used for shorter months'
+    )
+    recurrence_next_date = fields.Date(
+        string='Next Execution',
+        copy=False,
+        help='Accounting date of the next scheduled execution. Every period '
+             'up to today still pending is executed by the next scheduler run.'
+    )
+    recurrence_partner_id = fields.Many2one(
+        comodel_name='res.partner',
+        string='Default Partner',
+    )
+    recurrence_amount = fields.Monetary(
+        string='Default Amount',
+        currency_field='currency_id',
+    )
+    recurrence_journal_id = fields.Many2one(
+        comodel_name='account.journal',
+        string='Default Journal',
+        check_company=True,
+    )
+    recurrence_reference = fields.Char(
+        string='Default Reference',
+        help='Reference of the scheduled executions, followed by their date'
+    )
     note = fields.Text(string='Description')
     workflow_template_ids = fields.One2many(
         comodel_name='account.move.workflow.template',
@@ -43,17 +120,236 @@ class AccountMoveWorkflow(models.Model):
         string='Generated Journal Entries',
         copy=False
     )
+    trigger_ids = fields.One2many(
+        comodel_name='account.move.workflow.trigger',
+        inverse_name='workflow_id',
+        string='Triggers',
+        context={'active_test': False},
+        copy=True
+    )
+    run_ids = fields.One2many(
+        comodel_name='account.move.workflow.run',
+        inverse_name='workflow_id',
+        string='Executions',
+        copy=False
+    )
     generated_move_count = fields.Integer(
         string='Moves',
-        compute='_compute_generated_move_count',
-        store=True
+        compute='_compute_generated_statistics'
+    )
+    generated_amount_total = fields.Monetary(
+        string='Total Amount',
+        currency_field='currency_id',
+        compute='_compute_generated_statistics',
+        help='Sum of the totals of the generated entries of the companies '
+             'whose currency is the currency of the workflow. Entries of '
+             'companies in other currencies are not included.'
+    )
+    generated_date_first = fields.Date(
+        string='First Entry',
+        compute='_compute_generated_statistics'
+    )
+    generated_date_last = fields.Date(
+        string='Last Entry',
+        compute='_compute_generated_statistics'
+    )
+    run_done_count = fields.Integer(
+        string='Completed Executions',
+        compute='_compute_generated_statistics'
+    )
+    run_failed_count = fields.Integer(
+        string='Failed Executions',
+        compute='_compute_generated_statistics'
+    )
+    last_run_date = fields.Datetime(
+        string='Last Execution',
+        compute='_compute_generated_statistics'
+    )
+    execution_count = fields.Integer(
+        string='Logged Executions',
+        compute='_compute_execution_statistics'
+    )
+    execution_avg_duration = fields.Float(
+        string='Average Duration (s)',
+        digits=(16, 4),
+        compute='_compute_execution_statistics'
+    )
+    execution_avg_query_count = fields.Float(
+        string='Average Queries',
+        digits=(16, 1),
+        compute='_compute_execution_statistics'
+    )
+    execution_avg_row_duration = fields.Float(
+        string='Average Duration per Row (s)',
+        digits=(16, 4),
+        compute='_compute_execution_statistics'
+    )
+    execution_error_count = fields.Integer(
+        string='Logged Errors',
+        compute='_compute_execution_statistics'
     )
 
-    @api.depends('generated_move_ids')
-    def _compute_generated_move_count(self):
-        for record in self:
-            record.generated_move_count = len(record.generated_move_ids)
+    def _compute_generated_statistics(self):
+        """Aggregate the generated entries and the executions in SQL, one
+        grouped query each, without reading the entries themselves.
+
+        Entries are grouped by company as well: their signed totals are in
+        the currency of their company, so only the totals of the companies
+        in the currency of the workflow are summed."""
+        move_statistics = defaultdict(list)
+        for workflow, company, *values in self.env['account.move']._read_group(
+            domain=[('workflow_id', 'in', self.ids)],
+            groupby=['workflow_id', 'company_id'],
+            aggregates=['__count', 'amount_total_signed:sum', 'date:min', 'date:max'],
+        ):
+            move_statistics[workflow.id].append((company.currency_id, *values))
+        run_statistics = defaultdict(dict)
+        for workflow, state, count, last_date in self.env['account.move.workflow.run']._read_group(
+            domain=[('workflow_id', 'in', self.ids), ('state', 'in', ('done', 'failed'))],
+            groupby=['workflow_id', 'state'],
+            aggregates=['__count', 'create_date:max'],
+        ):
+            run_statistics[workflow.id][state] = (count, last_date)
+        for workflow in self:
+            groups = move_statistics[workflow.id]
+            currency = workflow.currency_id or self.env.company.currency_id
+            done_count, last_run_date = run_statistics[workflow.id].get('done', (0, False))
+            workflow.generated_move_count = sum(count for __, count, __, __, __ in groups)
+            workflow.generated_amount_total = sum(
+                amount for company_currency, __, amount, __, __ in groups if company_currency == currency
+            )
+            workflow.generated_date_first = min((date for *__, date, __ in groups), default=False)
+            workflow.generated_date_last = max((date for *__, date in groups), default=False)
+            workflow.run_done_count = done_count
+            workflow.run_failed_count = run_statistics[workflow.id].get('failed', (0, False))[0]
+            workflow.last_run_date = last_run_date
             
+    def _compute_execution_statistics(self):
+        groups = self.env['account.move.workflow.log']._read_group(
+            domain=[('workflow_id', 'in', self.ids), ('workflow_template_id', '=', False)],
+            groupby=['workflow_id'],
+            aggregates=['__count', 'duration:avg', 'query_count:avg', 'duration:sum', 'run_count:sum'],
+        )
+        statistics = {workflow.id: values for workflow, *values in groups}
+        errors = {
+            workflow.id: count
+            for workflow, count in self.env['account.move.workflow.log']._read_group(
+                domain=[('workflow_id', 'in', self.ids), ('error', '!=', False)],
+                groupby=['workflow_id'],
+                aggregates=['__count'],
+            )
+        }
+        for workflow in self:
+            count, avg_duration, avg_queries, total_duration, rows = statistics.get(workflow.id, (0, 0.0, 0.0, 0.0, 0))
+            workflow.execution_count = count
+            workflow.execution_avg_duration = avg_duration
+            workflow.execution_avg_query_count = avg_queries
+            workflow.execution_avg_row_duration = rows and total_duration / rows
+            workflow.execution_error_count = errors.get(workflow.id, 0)
+
+    def action_view_execution_logs(self):
+        self.ensure_one()
+        return {
+            'name': _('Execution Log: %s') % self.name,
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.move.workflow.log',
+            'view_mode': 'list,pivot,graph',
+            'domain': [('workflow_id', '=', self.id)],
+            'context': {'search_default_steps': 1, 'search_default_group_template': 1},
+        }
+
+    @api.constrains('recurrence', 'recurrence_day')
+    def _check_recurrence_day(self):
+        for workflow in self:
+            if workflow.recurrence == 'monthly' and not 1 <= workflow.recurrence_day <= 31:
+                raise ValidationError(_('The day of month of the recurrence must be between 1 and 31'))
+
+    @api.onchange('recurrence', 'recurrence_day')
+    def _onchange_recurrence(self):
+        if self.recurrence and not self.recurrence_next_date:
+            self.recurrence_next_date = self._get_first_recurrence_date(fields.Date.context_today(self))
+
+    def _get_first_recurrence_date(self, date):
+        """First scheduled date of the recurrence on or after ``date``"""
+        self.ensure_one()
+        if self.recurrence == 'monthly':
+            first_date = date + relativedelta(day=self.recurrence_day)
+            return first_date if first_date >= date else self._get_next_recurrence_date(first_date)
+        if self.recurrence == 'month_end':
+            return date_utils.end_of(date, 'month')
+        return date
+
+    def _get_next_recurrence_date(self, date):
+        """Scheduled date of the period following ``date``"""
+        self.ensure_one()
+        if self.recurrence == 'monthly':
+            return date + relativedelta(months=1, day=self.recurrence_day)
+        if self.recurrence == 'month_end':
+            return date_utils.end_of(date + relativedelta(days=1), 'month')
+        return date + relativedelta(days=1)
+
+    def _get_due_recurrence_dates(self, today):
+        """Dates of every period due up to ``today``, including the ones
+        missed while the scheduler did not run"""
+        self.ensure_one()
+        dates = []
+        date = self.recurrence_next_date
+        while date and date <= today:
+            dates.append(date)
+            date = self._get_next_recurrence_date(date)
+        return dates
+
+    def _prepare_recurrence_row(self, date):
+        """Parameter row of the scheduled execution of ``date``"""
+        self.ensure_one()
+        reference = ' '.join(filter(None, [
+            self.recurrence_reference or self.name,
+            fields.Date.to_string(date),
+        ]))
+        return {
+            'partner_id': self.recurrence_partner_id.id,
+            'amount': self.recurrence_amount,
+            'currency_id': self.currency_id.id,
+            'date': date,
+            'reference': reference,
+            'journal_id': self.recurrence_journal_id.id,
+            'company_id': self.company_id.id or self.env.company.id,
+            # one execution per period, whatever the parameters
+            'execution_key': hashlib.sha256(
+                json.dumps([self.id, 'recurrence', fields.Date.to_string(date)]).encode()
+            ).hexdigest(),
+        }
+
+    @api.model
+    def _cron_execute_recurring(self):
+        """Execute the scheduled workflows.
+
+        Every period due since the last execution of a workflow is executed
+        in a single batch, so a scheduler delayed for several periods catches
+        up in one pass. The execution keys of the rows make sure a period is
+        never executed twice."""
+        auto_commit = not self.env.registry.in_test_mode()
+        today = fields.Date.context_today(self)
+        workflows = self.search([
+            ('recurrence', '!=', False),
+            ('recurrence_next_date', '<=', today),
+        ])
+        for workflow in workflows:
+            dates = workflow._get_due_recurrence_dates(today)
+            company = workflow.company_id or self.env.company
+            try:
+                with self.env.cr.savepoint():
+                    workflow.with_company(company)._execute_batch(
+                        [workflow._prepare_recurrence_row(date) for date in dates]
+                    )
+                    workflow.recurrence_next_date = workflow._get_next_recurrence_date(dates[-1])
+            except Exception:
+                _logger.exception("Scheduled execution of workflow %s failed", workflow.name)
+                continue
+            _logger.info("Workflow %s executed for %s scheduled period(s)", workflow.name, len(dates))
+            if auto_commit:
+                self.env.cr.commit()
+
     @api.constrains('workflow_template_ids')
     def _check_template_sequences(self):
         for workflow in self:
@@ -62,13 +358,14 @@ class AccountMoveWorkflow(models.Model):
                 raise ValidationError(_('Template sequences must be unique within the same workflow'))
     
     def action_view_moves(self):
+        """Generated entries, listed by domain so the list is paginated and
+        filtered server-side whatever the size of the history"""
         self.ensure_one()
-        action = self.env.ref('account.action_move_journal_line').read()[0]
-        if self.generated_move_ids:
-            action.update({
-                'domain': [('id', 'in', self.generated_move_ids.ids)],
-                'context': {'create': False}
-            })
+        action = self.env['ir.actions.act_window']._for_xml_id('account.action_move_journal_line')
+        action.update({
+            'domain': [('workflow_id', '=', self.id)],
+            'context': {'create': False},
+        })
         return action
         
     def action_open_wizard(self):
@@ -86,10 +383,766 @@ class AccountMoveWorkflow(models.Model):
             }
         }
         
+    def action_open_import(self):
+        self.ensure_one()
+        return {
+            'name': _('Import Executions: %s') % self.name,
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.move.workflow.import',
+            'view_mode': 'form',
+            'target': 'new',
+            'context': {
+                'default_workflow_id': self.id,
+                'default_company_id': self.company_id.id or self.env.company.id,
+            }
+        }
+
     def copy(self, default=None):
         self.ensure_one()
         default = dict(default or {})
         default.update(name=_("%s (copy)") % self.name)
         if self.code:
             default.update(code=_("%s (copy)") % self.code)
-        return super().copy(default)
\ No newline at end of file
+        return super().copy(default)
+
+    # -------------------------------------------------------------------------
+    # Execution
+    # -------------------------------------------------------------------------
+
+    def _get_execution_plan(self):
+        """Return the execution plan of the workflow: one immutable
+        ``ExecutionStep`` per template, in sequence order, with companies,
+        journals, compiled conditions, overwrite values and formulas resolved.
+
+        Plans are cached in the registry, keyed by the write dates of the
+        workflow, its templates and their move templates and lines. As they
+        are shared by every user, they are built as superuser with an empty
+        context: no record rule, company restriction or language of the
+        first caller is baked into them."""
+        self.ensure_one()
+        return self._get_cached_execution_plan(self._get_execution_plan_key())
+
+    def _get_execution_plan_key(self):
+        self.ensure_one()
+        for model in ('account.move.workflow', 'account.move.workflow.template',
+                      'account.move.template', 'account.move.template.line'):
+            self.env[model].flush_model()
+        self.env.cr.execute("""
+               SELECT w.write_date,
+                      COUNT(DISTINCT t.id), MAX(t.write_date),
+                      MAX(mt.write_date),
+                      COUNT(DISTINCT mtl.id), MAX(mtl.write_date)
+                 FROM account_move_workflow w
+            LEFT JOIN account_move_workflow_template t ON t.workflow_id = w.id
+            LEFT JOIN account_move_template mt ON mt.id = t.template_id
+            LEFT JOIN account_move_template_line mtl ON mtl.template_id = mt.id
+                WHERE w.id = %s
+             GROUP BY w.id
+        """, (self.id,))
+        return tuple(self.env.cr.fetchone() or ())
+
+    @tools.ormcache('self.id', 'key')
+    def _get_cached_execution_plan(self, key):
+        workflow = self.with_env(self.env(context={}, su=True))
+        return tuple(
+            line._prepare_execution_step()
+            for line in workflow.workflow_template_ids.sorted(lambda l: l.sequence)
+        )
+
+    def _prepare_execution_row(self, values):
+        """Normalise one parameter row.
+
+        ``values`` may contain ``partner_id``, ``amount``, ``price_unit``,
+        ``currency_id``, ``date``, ``reference``, ``journal_id``,
+        ``company_id`` and ``source_move_id`` (ids or records), and
+        ``source_move_ids`` for a row consolidating several entries. Missing
+        keys default to the source move, then to the workflow.
+
+        Rows with source entries are executed once per source and
+        parameters. Rows without any are never taken for a duplicate, as two
+        identical executions may be legitimate, unless they are given the
+        same ``execution_key``."""
+        self.ensure_one()
+        source_move = self.env['account.move'].browse(self._get_row_id(values.get('source_move_id')))
+        source_moves = self.env['account.move'].browse(values.get('source_move_ids') or []) | source_move
+
+        def get(key, default):
+            return values[key] if key in values else default
+
+        partner = self.env['res.partner'].browse(self._get_row_id(get('partner_id', source_move.partner_id.id)))
+        currency = self.env['res.currency'].browse(
+            self._get_row_id(get('currency_id', source_move.currency_id.id or self.currency_id.id))
+        )
+        company = self.env['res.company'].browse(
+            self._get_row_id(get('company_id', source_move.company_id.id or self.company_id.id or self.env.company.id))
+        )
+        amount = get('amount', source_move.amount_total if source_move else 0.0)
+        row = {
+            'source_move': source_move,
+            'source_moves': source_moves,
+            'source_name': values.get('source_move_name') or ', '.join(source_moves.mapped('name')),
+            'partner': partner,
+            'amount': amount,
+            'price_unit': get('price_unit', 0.0) or amount,
+            'currency': currency,
+            'date': fields.Date.to_date(get('date', source_move.date or fields.Date.context_today(self))),
+            'reference': get('reference', source_move.ref or source_move.name or ''),
+            'journal': self.env['account.journal'].browse(self._get_row_id(values.get('journal_id'))),
+            'company': company,
+        }
+        row['execution_key'] = values.get('execution_key') or (
+            self._get_execution_key(row) if source_moves else uuid.uuid4().hex
+        )
+        return row
+
+    @api.model
+    def _get_row_id(self, value):
+        return value.id if isinstance(value, models.BaseModel) else value or False
+
+    def _get_execution_key(self, row):
+        """Deterministic key of the execution of this workflow for a
+        normalised row: the same source move and parameters give the same
+        key"""
+        self.ensure_one()
+        payload = json.dumps([
+            self.id,
+            row['source_move'].id,
+            row['partner'].id,
+            '%.6f' % row['amount'],
+            '%.6f' % row['price_unit'],
+            row['currency'].id,
+            fields.Date.to_string(row['date']),
+            row['reference'] or '',
+            row['journal'].id,
+            row['company'].id,
+        ] + ([sorted(row['source_moves'].ids)] if len(row['source_moves']) > 1 else []))
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _consolidate_rows(self, rows):
+        """Merge the normalised ``rows`` sharing the consolidation key of the
+        workflow (company, currency and the partner, date and journal when
+        enabled) into one row per group, keeping all their source entries.
+
+        Amounts are summed; partner, journal and reference are kept when
+        common to the group and the date is the latest of the group. A unit
+        price given by the rows is kept when common to the group, otherwise
+        the unit price is the summed amount. Rows whose source entries are
+        already part of an execution are dropped. Returns the consolidated
+        rows and the runs of the dropped rows."""
+        self.ensure_one()
+        executed_runs = self.env['account.move.workflow.run']
+        if not self.consolidate:
+            return rows, executed_runs
+        Move = self.env['account.move']
+        source_ids = [move_id for row in rows for move_id in row['source_moves'].ids]
+        if source_ids:
+            executed_runs = executed_runs.search([
+                ('workflow_id', '=', self.id),
+                ('state', 'not in', ('failed', 'reversed')),
+                '|', ('source_move_id', 'in', source_ids), ('source_move_ids', 'in', source_ids),
+            ])
+            executed_ids = set((executed_runs.source_move_id | executed_runs.source_move_ids).ids)
+            rows = [row for row in rows if executed_ids.isdisjoint(row['source_moves'].ids)]
+
+        groups = {}
+        for row in rows:
+            key = (
+                row['company'].id,
+                row['currency'].id,
+                self.consolidate_by_partner and row['partner'].id,
+                self.consolidate_by_date and row['date'],
+                self.consolidate_by_journal and row['journal'].id,
+            )
+            groups.setdefault(key, []).append(row)
+
+        consolidated = []
+        for group in groups.values():
+            if len(group) == 1:
+                consolidated.append(group[0])
+                continue
+            first = group[0]
+
+            def common(field):
+                return first[field] if all(row[field] == first[field] for row in group) else False
+
+            currency = first['currency']
+            # rows without a unit price of their own default it to their amount
+            given_price = any(row['price_unit'] != row['amount'] for row in group)
+            merged = self._prepare_execution_row({
+                'source_move_ids': Move.concat(*(row['source_moves'] for row in group)).ids,
+                'partner_id': common('partner'),
+                'amount': currency.round(sum(row['amount'] for row in group)),
+                'price_unit': given_price and common('price_unit'),
+                'currency_id': currency,
+                'date': max(row['date'] for row in group),
+                'reference': common('reference') or _('Consolidation of %s entries') % len(group),
+                'journal_id': common('journal'),
+                'company_id': first['company'],
+            })
+            # imported rows report on the first file line of their group
+            if 'import_line' in first:
+                merged['import_line'] = min(row['import_line'] for row in group)
+            consolidated.append(merged)
+        return consolidated, executed_runs
+
+    def _claim_execution_rows(self, rows):
+        """Split ``rows`` into the rows still to execute and the runs that
+        already exist for the other execution keys. Duplicated rows are only
+        kept once.
+
+        A single transaction lock per workflow serialises the claims of
+        concurrent executions of the workflow, whatever the number of rows.
+        A run committed by a concurrent claim after the snapshot of this
+        transaction is not found here: its key is caught when the runs are
+        created (see ``account.move.workflow.run._create_claimed_runs``)."""
+        self.ensure_one()
+        keys = list(dict.fromkeys(row['execution_key'] for row in rows))
+        if not keys:
+            return [], self.env['account.move.workflow.run']
+        self.env.cr.execute("SELECT pg_advisory_xact_lock(%s, %s)", (EXECUTION_LOCK_CLASS, self.id))
+        existing_runs = self.env['account.move.workflow.run'].search([('execution_key', 'in', keys)])
+        existing_keys = set(existing_runs.mapped('execution_key'))
+        new_rows = []
+        for row in rows:
+            if row['execution_key'] not in existing_keys:
+                existing_keys.add(row['execution_key'])
+                new_rows.append(row)
+        return new_rows, existing_runs
+
+    def _get_eval_context(self, row):
+        """Evaluation context of template conditions and overwrite values."""
+        return {
+            'partner': row['partner'],
+            'amount': row['amount'],
+            'currency': row['currency'],
+            'date': row['date'],
+            'env': self.env,
+            'user': self.env.user,
+            'company': row['company'],
+            'source_name': row['source_name'],
+            'previous_moves': self.env['account.move'],
+        }
+
+    def _check_execution_rows(self, rows):
+        """Raise every problem of the workflow configuration and of the
+        parameter ``rows`` at once, before anything is written"""
+        self.ensure_one()
+        errors = []
+        if not self.workflow_template_ids:
+            errors.append(_("This workflow doesn't have any templates configured."))
+        if self.partner_required and not all(row['partner'] for row in rows):
+            errors.append(_("Partner is required for this workflow."))
+        errors += self._get_preflight_errors(rows)
+        if errors:
+            raise ValidationError("\n".join(errors))
+
+    def _get_preflight_errors(self, rows):
+        """Check the journals, accounts, taxes and partners every template
+        of the execution plan would use for the parameter ``rows``.
+
+        Records are loaded with one query per model and the checks run once
+        per template and distinct (company, journal, partner set) of the
+        rows, so the cost does not grow with the number of rows. Templates
+        skipping their errors are not checked. Returns the error
+        messages."""
+        self.ensure_one()
+        plan = [step for step in self._get_execution_plan() if not step.skip_on_error]
+        errors = []
+
+        def add_error(step, message):
+            errors.append(_("Template %(template)s (sequence %(sequence)d): %(error)s") % {
+                'template': step.name,
+                'sequence': step.sequence,
+                'error': message,
+            })
+
+        for step in plan:
+            if step.error:
+                add_error(step, step.error)
+        plan = [step for step in plan if not step.error]
+
+        signatures = {(row['company'].id, row['journal'].id, bool(row['partner'])) for row in rows}
+        company_ids = {company_id for company_id, __, __ in signatures}
+        journal_ids = {journal_id for __, journal_id, __ in signatures}
+        account_ids = set()
+        tax_ids = set()
+        for step in plan:
+            company_ids.add(step.target_company_id)
+            journal_ids.add(step.journal_id)
+            for line_template in step.line_templates:
+                vals = dict(line_template.vals)
+                account_ids.update((vals.get('account_id'), line_template.opt_account_id))
+                for command in vals.get('tax_ids', ()):
+                    tax_ids.update(command[2])
+
+        # deprecated accounts are archived ones in the latest versions
+        Account = self.env['account.account']
+        account_state_fields = [name for name in ('deprecated', 'active') if name in Account._fields]
+        for model, ids, field_names in (
+            ('res.company', company_ids, ['name', 'parent_path']),
+            ('account.journal', journal_ids, ['name', 'company_id', 'active']),
+            ('account.account', account_ids, ['code', 'name', 'company_ids'] + account_state_fields),
+            ('account.tax', tax_ids, ['name', 'company_id']),
+        ):
+            self.env[model].browse(ids - {False, None}).fetch(field_names)
+
+        for account in Account.browse(account_ids - {False, None}):
+            if ('deprecated' in account_state_fields and account.deprecated
+                    or 'active' in account_state_fields and not account.active):
+                errors.append(_("Account %s is deprecated.") % account.display_name)
+
+        for step in plan:
+            for company_id, journal_id, has_partner in signatures:
+                company = self.env['res.company'].browse(step.target_company_id or company_id)
+                allowed_companies = company.parent_ids
+                journal = self.env['account.journal'].browse(step.journal_id or journal_id)
+                if not journal:
+                    add_error(step, _("No journal is set on the template or the parameters."))
+                elif not journal.active:
+                    add_error(step, _("Journal %s is archived.") % journal.display_name)
+                elif journal.company_id not in allowed_companies:
+                    add_error(step, _("Journal %(journal)s does not belong to company %(company)s.") % {
+                        'journal': journal.display_name,
+                        'company': company.name,
+                    })
+                for line_template in step.line_templates:
+                    vals = dict(line_template.vals)
+                    for account in Account.browse(
+                        tuple(filter(None, (vals.get('account_id'), line_template.opt_account_id)))
+                    ):
+                        if not account.company_ids & allowed_companies:
+                            add_error(step, _("Account %(account)s is not available in company %(company)s.") % {
+                                'account': account.display_name,
+                                'company': company.name,
+                            })
+                    for command in vals.get('tax_ids', ()):
+                        for tax in self.env['account.tax'].browse(command[2]):
+                            if tax.company_id not in allowed_companies:
+                                add_error(step, _("Tax %(tax)s does not belong to company %(company)s.") % {
+                                    'tax': tax.display_name,
+                                    'company': company.name,
+                                })
+                if step.move_type and step.move_type != 'entry' and not has_partner and not step.partner_id:
+                    add_error(step, _("A partner is required to create an invoice or a bill."))
+        return list(dict.fromkeys(errors))
+
+    def _execute_batch(self, rows, post_mode=None):
+        """Execute the workflow once per parameter row.
+
+        Each row is recorded as an ``account.move.workflow.run`` linked to its
+        moves, then executed by ``_execute_runs``. A row whose execution key
+        already has a run is not executed again: the moves of that run are
+        returned instead. Returns the moves of all the rows.
+
+        ``post_mode`` overrides the posting mode of the workflow: with
+        ``deferred`` all the moves are created as draft and posted with a
+        single ``_post()`` call at the end."""
+        self.ensure_one()
+        Run = self.env['account.move.workflow.run']
+        rows, executed_runs = self._consolidate_rows([self._prepare_execution_row(values) for values in rows])
+        if not rows:
+            return executed_runs.move_ids
+        self._check_execution_rows(rows)
+
+        # Rows already executed return their existing moves, failed ones are
+        # executed again on their existing run
+        rows, existing_runs = self._claim_execution_rows(rows)
+        retry_runs = existing_runs.filtered(lambda r: r.state == 'failed')
+        rows += [self._prepare_execution_row(run._prepare_execution_values()) for run in retry_runs]
+        # Rows dropped by the consolidation return the moves of the runs
+        # already covering their source entries
+        existing_moves = (existing_runs - retry_runs).move_ids | executed_runs.move_ids
+        if not rows:
+            return existing_moves
+
+        # The whole batch runs in a savepoint: a failing template without
+        # skip_on_error rolls back every move and run of the batch at once.
+        with self.env.cr.savepoint():
+            runs = Run._create_claimed_runs(
+                [Run._prepare_run_vals(self, row) for row in rows[:len(rows) - len(retry_runs)]]
+            )
+            moves = self._execute_runs(runs + retry_runs, rows=rows, post_mode=post_mode)
+        return moves | existing_moves
+
+    def _execute_runs(self, runs, rows=None, post_mode=None):
+        """Execute the given runs of this workflow.
+
+        Templates are evaluated in sequence for all the runs at once and
+        their moves are created in bulk, one ``create(vals_list)`` per target
+        company. When no template reads ``previous_moves`` the moves of all
+        the templates are created together once every template has been
+        evaluated; otherwise the moves of each template are created before
+        the next one is evaluated. ``rows`` are the normalised parameter rows
+        of the runs, rebuilt from the runs when not given.
+
+        Timings and query counts of the execution and of every template step
+        are stored as ``account.move.workflow.log`` records. The
+        ``workflow_sequence`` of a move is its rank among the moves actually
+        created for its row."""
+        self.ensure_one()
+        post_mode = post_mode or self.post_mode
+        Move = self.env['account.move']
+        execution_log = self._start_execution_log(runs)
+        step_logs = []
+        try:
+            if rows is None:
+                rows = [self._prepare_execution_row(run._prepare_execution_values()) for run in runs]
+                self._check_execution_rows(rows)
+
+            with self.env.cr.savepoint():
+                runs.write({'state': 'running'})
+                eval_contexts = [self._get_eval_context(row) for row in rows]
+                row_moves = [Move] * len(rows)
+                # sequences are planned as if every prepared move was created,
+                # then fixed on the created moves when some of them failed
+                planned_sequences = [1] * len(rows)
+                row_sequences = [1] * len(rows)
+                created_moves = Move
+                plan = self._get_execution_plan()
+                grouped = not self._plan_reads_previous_moves(plan)
+
+                pending = []
+                for step in plan:
+                    step_log = self._start_execution_log(runs, step)
+                    step_logs.append(step_log)
+                    pending += self._execute_step(step, runs, rows, eval_contexts, planned_sequences, step_log)
+                    self._stop_execution_log(step_log)
+                    if not grouped or step is plan[-1]:
+                        moves = self._create_pending_moves(pending, post=post_mode == 'immediate')
+                        resequence = defaultdict(list)
+                        for (index, __, __, vals), move in zip(pending, moves):
+                            if not move:
+                                continue
+                            if vals['workflow_sequence'] != row_sequences[index]:
+                                resequence[row_sequences[index]].append(move.id)
+                            row_sequences[index] += 1
+                            created_moves |= move
+                            row_moves[index] |= move
+                            eval_contexts[index]['previous_moves'] = row_moves[index]
+                        for sequence, move_ids in resequence.items():
+                            Move.browse(move_ids).write({'workflow_sequence': sequence})
+                        planned_sequences = list(row_sequences)
+                        pending = []
+
+                if post_mode == 'deferred' and created_moves:
+                    created_moves._post(soft=False)
+                runs.write({'state': 'done'})
+            self._stop_execution_log(execution_log, created_moves)
+        except Exception as e:
+            execution_log['error'] = str(e)
+            raise
+        finally:
+            logs = [execution_log] + step_logs
+            for log in logs:
+                if 'start' in log:
+                    self._stop_execution_log(log)
+            if 'error' in execution_log:
+                self._create_failure_logs(logs)
+            else:
+                self.env['account.move.workflow.log'].sudo().create(logs)
+        return created_moves
+
+    def _create_failure_logs(self, logs):
+        """Store the logs of a failed execution on a separate cursor, so
+        they outlive the rollback of the transaction that executed it.
+
+        Runs, jobs and template steps not committed yet are not visible from
+        that cursor and are left out of the logs."""
+        self.ensure_one()
+        try:
+            with self.env.registry.cursor() as cr:
+                env = self.env(cr=cr, su=True)
+                if not env[self._name].browse(self.id).exists():
+                    return
+                existing_ids = {}
+                for field_name, model in (
+                    ('run_id', 'account.move.workflow.run'),
+                    ('job_id', 'account.move.workflow.job'),
+                    ('workflow_template_id', 'account.move.workflow.template'),
+                ):
+                    ids = {log[field_name] for log in logs if log[field_name]}
+                    existing_ids[field_name] = set(env[model].browse(ids).exists().ids)
+                env['account.move.workflow.log'].create([
+                    dict(log, **{
+                        field_name: log[field_name] if log[field_name] in ids else False
+                        for field_name, ids in existing_ids.items()
+                    })
+                    for log in logs
+                ])
+        except Exception:
+            _logger.exception("Could not store the execution logs of workflow %s", self.name)
+
+    @api.model
+    def _plan_reads_previous_moves(self, plan):
+        """Whether a condition or an overwrite value of the execution plan
+        reads the moves created by the previous templates of the row"""
+        return any(
+            'previous_moves' in step.condition_variables + step.overwrite_variables
+            for step in plan
+        )
+
+    def _execute_step(self, step, runs, rows, eval_contexts, planned_sequences, step_log):
+        """Prepare the moves of one template for all the rows whose condition
+        holds. Returns (row index, step, step log, move values) tuples to be
+        created by ``_create_pending_moves``."""
+        line = self.env['account.move.workflow.template'].browse(step.id)
+        if step.error:
+            self._handle_template_error(step, step.error, step_log)
+            return []
+
+        selected = []
+        for index in range(len(rows)):
+            try:
+                if line._eval_condition(eval_contexts[index], step):
+                    selected.append(index)
+                else:
+                    _logger.info("Skipping template %s: condition not met", step.name)
+            except Exception as e:
+                self._handle_template_error(step, e, step_log)
+        step_log['selected_count'] = len(selected)
+
+        # Line amounts of all the selected rows in one pass
+        try:
+            amounts = line._compute_amounts([rows[index]['amount'] for index in selected], step)
+        except Exception as e:
+            self._handle_template_error(step, e, step_log)
+            return []
+
+        pending = []
+        for index, sequence2amount in zip(selected, amounts):
+            try:
+                move_vals = line._prepare_move_vals(rows[index], eval_contexts[index], step, sequence2amount)
+            except Exception as e:
+                self._handle_template_error(step, e, step_log)
+                continue
+            move_vals.update({
+                'workflow_id': self.id,
+                'workflow_run_id': runs[index].id,
+                'workflow_template_id': step.id,
+                'workflow_sequence': planned_sequences[index],
+            })
+            planned_sequences[index] += 1
+            pending.append((index, step, step_log, move_vals))
+        return pending
+
+    def _start_execution_log(self, runs, step=None):
+        return {
+            'workflow_id': self.id,
+            'workflow_template_id': step.id if step else False,
+            'template_sequence': step.sequence if step else 0,
+            'run_id': runs.id if len(runs) == 1 else False,
+            'job_id': runs[:1].job_id.id,
+            'run_count': len(runs),
+            'selected_count': len(runs),
+            'move_count': 0,
+            'line_count': 0,
+            'start': time.perf_counter(),
+            'query_start': self.env.cr.sql_log_count,
+        }
+
+    def _stop_execution_log(self, log, moves=None):
+        """Store the duration and query count of ``log``, and the counts of
+        ``moves`` when given (step logs count their moves as they are
+        created)"""
+        log.update({
+            'duration': time.perf_counter() - log.pop('start'),
+            'query_count': self.env.cr.sql_log_count - log.pop('query_start'),
+        })
+        if moves is not None:
+            log.update({
+                'move_count': len(moves),
+                'line_count': len(moves.line_ids),
+            })
+
+    def _create_pending_moves(self, pending, post=True):
+        """Create the moves prepared by ``_execute_step``, posting them
+        unless ``post`` is False.
+
+        The moves are grouped by company: each group is created under
+        ``with_company`` with the journals, accounts, taxes and partners it
+        uses loaded beforehand, so the number of ``create`` calls follows the
+        number of target companies, not the number of templates. Returns one
+        move (or ``None``) per pending tuple."""
+        start, query_start = time.perf_counter(), self.env.cr.sql_log_count
+        positions_by_company = defaultdict(list)
+        for position, (__, __, __, vals) in enumerate(pending):
+            positions_by_company[vals['company_id']].append(position)
+
+        results = [None] * len(pending)
+        for company_id, positions in positions_by_company.items():
+            workflow = self.with_company(company_id)
+            items = [pending[position][1:] for position in positions]
+            workflow._prefetch_move_records([vals for __, __, vals in items])
+            for position, move in zip(positions, workflow._create_company_moves(items, post=post)):
+                results[position] = move
+        self._charge_creation_cost(
+            pending, time.perf_counter() - start, self.env.cr.sql_log_count - query_start,
+        )
+        return results
+
+    @api.model
+    def _charge_creation_cost(self, pending, duration, query_count):
+        """Add the duration and query count of creating the ``pending`` moves
+        to the logs of their steps.
+
+        One ``create`` call creates the moves of several steps, so its cost
+        is shared between the steps in proportion to the number of lines
+        they prepared."""
+        weights = {}
+        for __, __, log, vals in pending:
+            __, weight = weights.get(id(log), (log, 0))
+            weights[id(log)] = (log, weight + max(len(vals.get('line_ids', ())), 1))
+        total = sum(weight for __, weight in weights.values())
+        charged_queries = 0
+        for position, (log, weight) in enumerate(weights.values(), start=1):
+            if position == len(weights):
+                queries = query_count - charged_queries
+            else:
+                queries = round(query_count * weight / total)
+            charged_queries += queries
+            log['duration'] += duration * weight / total
+            log['query_count'] += queries
+
+    def _prefetch_move_records(self, vals_list):
+        """Load the journals, accounts, taxes and partners used by the move
+        values of one company with one query per model"""
+        record_ids = defaultdict(set)
+        for vals in vals_list:
+            record_ids['account.journal'].add(vals.get('journal_id'))
+            record_ids['res.partner'].add(vals.get('partner_id'))
+            for command in vals.get('line_ids', ()):
+                line_vals = command[2]
+                record_ids['account.account'].add(line_vals.get('account_id'))
+                record_ids['res.partner'].add(line_vals.get('partner_id'))
+                for tax_command in line_vals.get('tax_ids', ()):
+                    record_ids['account.tax'].update(tax_command[2])
+        for model, ids in record_ids.items():
+            ids.discard(None)
+            ids.discard(False)
+            if ids:
+                self.env[model].browse(ids).fetch()
+
+    def _create_company_moves(self, items, post=True):
+        """Create the moves of one company from (step, step log, values)
+        tuples.
+
+        The moves are created in a savepoint. When the grouped creation
+        fails, each move is retried in a savepoint of its own so that only
+        the failing rows are skipped. Returns one move (or ``None``) per
+        tuple and counts the created moves in the logs of their steps."""
+        Move = self.env['account.move']
+        if not items:
+            return []
+        try:
+            with self.env.cr.savepoint():
+                moves = Move.create([vals for __, __, vals in items])
+                if post:
+                    moves.action_post()
+            results = list(moves)
+        except Exception as e:
+            if len(items) == 1:
+                step, log, __ = items[0]
+                self._handle_template_error(step, e, log)
+                return [None]
+            results = []
+            for step, log, vals in items:
+                try:
+                    with self.env.cr.savepoint():
+                        move = Move.create(vals)
+                        if post:
+                            move.action_post()
+                    results.append(move)
+                except Exception as e:
+                    self._handle_template_error(step, e, log)
+                    results.append(None)
+
+        for (__, log, __), move in zip(items, results):
+            if move:
+                log['move_count'] += 1
+                log['line_count'] += len(move.line_ids)
+        return results
+
+    def _handle_template_error(self, step, error, log=None):
+        _logger.error("Error executing workflow template %s: %s", step.name, error)
+        if log is not None:
+            log['error'] = '\n'.join(filter(None, [log.get('error'), str(error)]))
+        if step.skip_on_error:
+            return
+        raise UserError(_(
+            "Error executing template %(template)s (sequence %(sequence)d): %(error)s"
+        ) % {
+            'template': step.name,
+            'sequence': step.sequence,
+            'error': str(error)
+        })
+
+    def _get_action_generated_moves(self, moves):
+        action = {
+            'name': _('Generated Journal Entries'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.move',
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', moves.ids)],
+            'context': {'create': False}
+        }
+        if len(moves) == 1:
+            action.update({
+                'view_mode': 'form',
+                'res_id': moves.id,
+            })
+        return action
+
+    def _enqueue_batch(self, rows, post_mode=None, chunk_size=None, user=None):
+        """Queue parameter rows for background execution and return the
+        ``account.move.workflow.job`` processing them, with the access rights
+        of ``user`` (the current user by default)."""
+        self.ensure_one()
+        rows, __ = self._consolidate_rows([self._prepare_execution_row(values) for values in rows])
+        # Rows already executed or queued are not queued again
+        rows, __ = self._claim_execution_rows(rows)
+        job_vals = {
+            'workflow_id': self.id,
+            'company_id': self.company_id.id or self.env.company.id,
+            'post_mode': post_mode,
+        }
+        if chunk_size:
+            job_vals['chunk_size'] = chunk_size
+        if user:
+            job_vals['user_id'] = user.id
+        job = self.env['account.move.workflow.job'].create(job_vals)
+        job._add_rows(rows)
+        job._trigger_processing()
+        return job
+
+    def enqueue_batch(self, rows, post_mode=None, chunk_size=None):
+        """Queue parameter rows for background execution and return an
+        action displaying the queued job."""
+        self.ensure_one()
+        job = self._enqueue_batch(rows, post_mode=post_mode, chunk_size=chunk_size)
+        return {
+            'name': _('Queued Workflow Execution'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.move.workflow.job',
+            'view_mode': 'form',
+            'res_id': job.id,
+        }
+
+    def execute(self, post_mode=None, **values):
+        """Execute the workflow once and return the generated moves.
+
+        ``values`` are the parameters of the execution, as accepted by
+        ``_prepare_execution_row`` (``partner_id``, ``amount``, ``date``,
+        ...). Nothing but the run and its moves is written, so scripts and
+        other modules should call this rather than going through the
+        wizard."""
+        self.ensure_one()
+        return self._execute_batch([values], post_mode=post_mode)
+
+    def execute_batch(self, rows, post_mode=None):
+        """Execute the workflow for a list of parameter rows and return an
+        action displaying the generated journal entries."""
+        self.ensure_one()
+        moves = self._execute_batch(rows, post_mode=post_mode)
+        if not moves:
+            raise UserError(_("No journal entries were created. Please check template conditions."))
+        return self._get_action_generated_moves(moves)
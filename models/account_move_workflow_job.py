@@ -0,0 +1,202 @@
+import logging
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+
+class AccountMoveWorkflowJob(models.Model):
+    _name = 'account.move.workflow.job'
+    _description = 'Queued Accounting Workflow Execution'
+    _order = 'id desc'
+    _check_company_auto = True
+
+    workflow_id = fields.Many2one(
+        comodel_name='account.move.workflow',
+        string='Workflow',
+        required=True,
+        readonly=True,
+        ondelete='cascade',
+        index=True,
+    )
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        string='Company',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company,
+    )
+    user_id = fields.Many2one(
+        comodel_name='res.users',
+        string='Submitted by',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.user,
+        help='The rows are executed with the access rights of this user',
+    )
+    state = fields.Selection(
+        selection=[
+            ('importing', 'Importing'),
+            ('queued', 'Queued'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('cancel', 'Cancelled'),
+        ],
+        default='queued',
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    post_mode = fields.Selection(
+        selection=[
+            ('immediate', 'Post each entry when created'),
+            ('deferred', 'Post all entries at the end'),
+        ],
+        string='Posting',
+        help='Overrides the posting mode of the workflow. In deferred mode the '
+             'entries of a whole chunk are posted together.'
+    )
+    chunk_size = fields.Integer(
+        string='Chunk Size',
+        required=True,
+        default=100,
+        help='Number of rows executed and committed together',
+    )
+    run_ids = fields.One2many(
+        comodel_name='account.move.workflow.run',
+        inverse_name='job_id',
+        string='Rows',
+        readonly=True,
+    )
+    row_count = fields.Integer(string='Rows', readonly=True)
+    processed_count = fields.Integer(string='Processed', readonly=True)
+    failed_count = fields.Integer(string='Failed', readonly=True)
+    progress = fields.Float(compute='_compute_progress')
+    last_run_id = fields.Many2one(
+        comodel_name='account.move.workflow.run',
+        string='Last Processed Row',
+        readonly=True,
+    )
+    date_start = fields.Datetime(string='Started on', readonly=True)
+    date_end = fields.Datetime(string='Finished on', readonly=True)
+
+    @api.depends('row_count', 'processed_count')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = job.row_count and 100.0 * job.processed_count / job.row_count
+
+    @api.depends('workflow_id', 'create_date')
+    def _compute_display_name(self):
+        for job in self:
+            job.display_name = '%s #%s' % (job.workflow_id.name or '', job.id or '')
+
+    def _add_rows(self, rows):
+        """Queue normalised parameter rows on this job"""
+        self.ensure_one()
+        Run = self.env['account.move.workflow.run']
+        runs = Run._create_claimed_runs([
+            dict(
+                Run._prepare_run_vals(self.workflow_id, row, state='queued'),
+                job_id=self.id,
+                import_line=row.get('import_line', 0),
+            )
+            for row in rows
+        ])
+        self.row_count += len(runs)
+        return runs
+
+    def _add_failed_rows(self, vals_list):
+        """Record rows rejected before execution (unreadable or duplicated
+        rows of an imported file) as failed runs of this job"""
+        self.ensure_one()
+        if not vals_list:
+            return self.env['account.move.workflow.run']
+        runs = self.env['account.move.workflow.run'].create([
+            dict(vals, workflow_id=self.workflow_id.id, company_id=self.company_id.id, job_id=self.id, state='failed')
+            for vals in vals_list
+        ])
+        self.write({
+            'row_count': self.row_count + len(runs),
+            'processed_count': self.processed_count + len(runs),
+            'failed_count': self.failed_count + len(runs),
+        })
+        return runs
+
+    @api.model
+    def _trigger_processing(self):
+        self.env.ref('account_move_workflow.ir_cron_process_workflow_jobs')._trigger()
+
+    @api.model
+    def _cron_process_jobs(self):
+        """Process queued jobs chunk by chunk, committing after each chunk.
+
+        Jobs left running by an interrupted worker are resumed from their
+        first row still queued."""
+        for job in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            job._process()
+
+    def _process(self):
+        self.ensure_one()
+        auto_commit = not self.env.registry.in_test_mode()
+        if self.state == 'queued':
+            self.write({'state': 'running', 'date_start': fields.Datetime.now()})
+        Run = self.env['account.move.workflow.run']
+        while self.state == 'running':
+            # the job may have been cancelled by another transaction
+            self.invalidate_recordset(['state'])
+            if self.state != 'running':
+                break
+            runs = Run.search([('job_id', '=', self.id), ('state', '=', 'queued')], order='id', limit=self.chunk_size)
+            if not runs:
+                self.write({'state': 'done', 'date_end': fields.Datetime.now()})
+            else:
+                self._process_chunk(runs)
+            if auto_commit:
+                self.env.cr.commit()
+
+    def _process_chunk(self, runs):
+        """Execute one chunk of rows. When the chunk fails as a whole, its
+        rows are executed one by one so the failure is recorded only on the
+        failing rows."""
+        self.ensure_one()
+        workflow = self.workflow_id.with_user(self.user_id).with_company(self.company_id)
+        runs = runs.with_user(self.user_id).with_company(self.company_id)
+        try:
+            workflow._execute_runs(runs, post_mode=self.post_mode)
+        except Exception:
+            for run in runs:
+                try:
+                    workflow._execute_runs(run, post_mode=self.post_mode)
+                except Exception as e:
+                    _logger.warning("Workflow job %s: row %s failed: %s", self.id, run.id, e)
+                    run.sudo().write({'state': 'failed', 'error_message': str(e)})
+        self.write({
+            'processed_count': self.processed_count + len(runs),
+            'failed_count': self.failed_count + len(runs.filtered(lambda r: r.state == 'failed')),
+            'last_run_id': runs[-1].id,
+        })
+
+    def action_retry_failed(self):
+        # rows rejected before execution have no parameters to execute again
+        failed_runs = self.run_ids.filtered(lambda r: r.state == 'failed' and r.execution_key)
+        if not failed_runs:
+            raise UserError(_('There are no failed rows to retry.'))
+        for job in self:
+            job_failed = failed_runs.filtered(lambda r: r.job_id == job)
+            job.write({
+                'state': 'queued',
+                'date_end': False,
+                'processed_count': job.processed_count - len(job_failed),
+                'failed_count': job.failed_count - len(job_failed),
+            })
+        failed_runs.write({'state': 'queued', 'error_message': False})
+        self._trigger_processing()
+
+    def action_cancel(self):
+        self.filtered(lambda j: j.state in ('importing', 'queued', 'running')).write({'state': 'cancel'})
+        self.run_ids.filtered(lambda r: r.state == 'queued').write({'state': 'failed', 'error_message': _('Cancelled')})
+
+    def action_view_moves(self):
+        self.ensure_one()
+        return self.workflow_id._get_action_generated_moves(self.run_ids.move_ids)
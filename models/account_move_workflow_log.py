@@ -0,0 +1,54 @@
+from odoo import fields, models
+
+
+class AccountMoveWorkflowLog(models.Model):
+    _name = 'account.move.workflow.log'
+    _description = 'Accounting Workflow Execution Log'
+    _order = 'id desc'
+
+    workflow_id = fields.Many2one(
+        comodel_name='account.move.workflow',
+        string='Workflow',
+        required=True,
+        readonly=True,
+        ondelete='cascade',
+        index=True,
+    )
+    workflow_template_id = fields.Many2one(
+        comodel_name='account.move.workflow.template',
+        string='Template Step',
+        readonly=True,
+        ondelete='set null',
+        index='btree_not_null',
+        help='Empty for the log of the whole execution',
+    )
+    template_id = fields.Many2one(
+        comodel_name='account.move.template',
+        related='workflow_template_id.template_id',
+        string='Template',
+    )
+    template_sequence = fields.Integer(string='Sequence', readonly=True)
+    run_id = fields.Many2one(
+        comodel_name='account.move.workflow.run',
+        string='Execution',
+        readonly=True,
+        ondelete='set null',
+        help='Set when a single execution was processed',
+    )
+    job_id = fields.Many2one(
+        comodel_name='account.move.workflow.job',
+        string='Queued Job',
+        readonly=True,
+        ondelete='set null',
+    )
+    run_count = fields.Integer(string='Rows', readonly=True)
+    selected_count = fields.Integer(
+        string='Conditions Met',
+        readonly=True,
+        help='Rows for which the condition of the template held',
+    )
+    move_count = fields.Integer(string='Moves Created', readonly=True)
+    line_count = fields.Integer(string='Lines Created', readonly=True)
+    duration = fields.Float(string='Duration (s)', digits=(16, 4), readonly=True, aggregator='avg')
+    query_count = fields.Integer(string='Queries', readonly=True, aggregator='avg')
+    error = fields.Text(readonly=True)
@@ -0,0 +1,166 @@
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models
+
+_logger = logging.getLogger(__name__)
+
+# Moves written shortly before the last refresh may have been committed after
+# it: they are aggregated again by the next refresh
+REFRESH_MARGIN = timedelta(minutes=10)
+REFRESH_PARAMETER = 'account_move_workflow.report_refresh_date'
+
+
+class AccountMoveWorkflowReport(models.Model):
+    _name = 'account.move.workflow.report'
+    _description = 'Accounting Workflow Analysis'
+    _auto = False
+    _order = 'period desc, workflow_id, template_sequence'
+
+    workflow_id = fields.Many2one(
+        comodel_name='account.move.workflow',
+        string='Workflow',
+        readonly=True,
+    )
+    workflow_template_id = fields.Many2one(
+        comodel_name='account.move.workflow.template',
+        string='Template Step',
+        readonly=True,
+    )
+    template_sequence = fields.Integer(string='Template Sequence', readonly=True)
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        string='Company',
+        readonly=True,
+    )
+    journal_id = fields.Many2one(
+        comodel_name='account.journal',
+        string='Journal',
+        readonly=True,
+    )
+    period = fields.Date(string='Period', readonly=True)
+    currency_id = fields.Many2one(
+        comodel_name='res.currency',
+        string='Currency',
+        readonly=True,
+    )
+    move_count = fields.Integer(string='Entries', readonly=True)
+    amount = fields.Monetary(string='Amount', readonly=True)
+
+    def init(self):
+        """Aggregate table of the posted generated moves, with the queue of
+        (workflow, period) pairs whose moves were moved or deleted"""
+        self.env.cr.execute("""
+            CREATE TABLE IF NOT EXISTS account_move_workflow_report (
+                id SERIAL PRIMARY KEY,
+                workflow_id INTEGER NOT NULL,
+                workflow_template_id INTEGER,
+                template_sequence INTEGER,
+                company_id INTEGER NOT NULL,
+                journal_id INTEGER,
+                period DATE NOT NULL,
+                currency_id INTEGER,
+                move_count INTEGER NOT NULL,
+                amount NUMERIC NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS account_move_workflow_report_workflow_period_index
+                ON account_move_workflow_report (workflow_id, period);
+            CREATE TABLE IF NOT EXISTS account_move_workflow_report_dirty (
+                workflow_id INTEGER NOT NULL,
+                period DATE NOT NULL
+            );
+        """)
+
+    @api.model
+    def _mark_dirty(self, moves):
+        """Queue the current periods of generated ``moves`` about to be
+        deleted or moved to another workflow or period"""
+        moves = moves.filtered('workflow_id')
+        if not moves:
+            return
+        moves.flush_recordset(['workflow_id', 'date'])
+        self.env.cr.execute("""
+            INSERT INTO account_move_workflow_report_dirty (workflow_id, period)
+            SELECT DISTINCT workflow_id, date_trunc('month', date)::date
+              FROM account_move
+             WHERE id IN %s AND workflow_id IS NOT NULL
+        """, [tuple(moves.ids)])
+
+    @api.model
+    def _cron_refresh(self):
+        self._refresh()
+
+    @api.model
+    def _refresh(self, full=False):
+        """Bring the aggregate table up to date.
+
+        Only the (workflow, period) pairs with moves written since the last
+        refresh, or queued by ``_mark_dirty``, are aggregated again. The
+        whole table is rebuilt on the first refresh or when ``full`` is
+        set."""
+        cr = self.env.cr
+        self.env['account.move'].flush_model([
+            'workflow_id', 'workflow_template_id', 'date', 'state',
+            'company_id', 'journal_id', 'amount_total_signed',
+        ])
+        self.env['account.move.workflow.template'].flush_model(['sequence'])
+        ICP = self.env['ir.config_parameter'].sudo()
+        last_refresh = ICP.get_param(REFRESH_PARAMETER)
+        refresh_date = cr.now()
+
+        cr.execute("DELETE FROM account_move_workflow_report_dirty RETURNING workflow_id, period")
+        dirty = set(cr.fetchall())
+        if full or not last_refresh:
+            cr.execute("DELETE FROM account_move_workflow_report")
+            join, params = "", []
+        else:
+            cr.execute("""
+                SELECT DISTINCT workflow_id, date_trunc('month', date)::date
+                  FROM account_move
+                 WHERE workflow_id IS NOT NULL AND write_date >= %s
+            """, [fields.Datetime.to_datetime(last_refresh) - REFRESH_MARGIN])
+            dirty.update(cr.fetchall())
+            if dirty:
+                workflow_ids, periods = zip(*dirty)
+                params = [list(workflow_ids), list(periods)]
+                cr.execute("""
+                    DELETE FROM account_move_workflow_report report
+                     USING unnest(%s::int[], %s::date[]) AS dirty(workflow_id, period)
+                     WHERE report.workflow_id = dirty.workflow_id
+                       AND report.period = dirty.period
+                """, params)
+                join = """
+                    JOIN unnest(%s::int[], %s::date[]) AS dirty(workflow_id, period)
+                      ON move.workflow_id = dirty.workflow_id
+                     AND move.date >= dirty.period
+                     AND move.date < dirty.period + INTERVAL '1 month'
+                """
+
+        if full or not last_refresh or dirty:
+            cr.execute("""
+                INSERT INTO account_move_workflow_report (
+                    workflow_id, workflow_template_id, template_sequence, company_id,
+                    journal_id, period, currency_id, move_count, amount
+                )
+                SELECT move.workflow_id,
+                       move.workflow_template_id,
+                       step.sequence,
+                       move.company_id,
+                       move.journal_id,
+                       date_trunc('month', move.date)::date,
+                       company.currency_id,
+                       COUNT(*),
+                       SUM(move.amount_total_signed)
+                  FROM account_move move
+                  %s
+                  JOIN res_company company ON company.id = move.company_id
+             LEFT JOIN account_move_workflow_template step ON step.id = move.workflow_template_id
+                 WHERE move.workflow_id IS NOT NULL
+                   AND move.state = 'posted'
+              GROUP BY move.workflow_id, move.workflow_template_id, step.sequence, move.company_id,
+                       move.journal_id, date_trunc('month', move.date), company.currency_id
+            """ % join, params)
+            _logger.info("Workflow report refreshed: %s rows", cr.rowcount)
+
+        ICP.set_param(REFRESH_PARAMETER, fields.Datetime.to_string(refresh_date))
+        self.invalidate_model()
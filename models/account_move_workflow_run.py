@@ -0,0 +1,235 @@
+from collections import defaultdict
+
+from psycopg2.errors import SerializationFailure, UniqueViolation
+
+from odoo import api, fields, models, Command, _
+from odoo.exceptions import UserError
+
+
+class AccountMoveWorkflowRun(models.Model):
+    _name = 'account.move.workflow.run'
+    _description = 'Accounting Workflow Execution'
+    _order = 'id desc'
+    _check_company_auto = True
+
+    workflow_id = fields.Many2one(
+        comodel_name='account.move.workflow',
+        string='Workflow',
+        required=True,
+        readonly=True,
+        ondelete='cascade',
+        index=True,
+    )
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        string='Company',
+        required=True,
+        readonly=True,
+        default=lambda self: self.env.company,
+        index=True,
+    )
+    source_move_id = fields.Many2one(
+        comodel_name='account.move',
+        string='Source Move',
+        readonly=True,
+        index='btree_not_null',
+        help='Journal entry that triggered this execution',
+    )
+    source_move_ids = fields.Many2many(
+        comodel_name='account.move',
+        relation='account_move_workflow_run_source_move_rel',
+        column1='run_id',
+        column2='move_id',
+        string='Consolidated Source Moves',
+        readonly=True,
+        help='Journal entries consolidated into this execution',
+    )
+    partner_id = fields.Many2one(
+        comodel_name='res.partner',
+        string='Partner',
+        readonly=True,
+    )
+    amount = fields.Monetary(
+        string='Amount',
+        readonly=True,
+    )
+    price_unit = fields.Float(
+        string='Unit Price',
+        readonly=True,
+    )
+    currency_id = fields.Many2one(
+        comodel_name='res.currency',
+        string='Currency',
+        readonly=True,
+    )
+    date = fields.Date(
+        string='Accounting Date',
+        readonly=True,
+    )
+    reference = fields.Char(
+        string='Reference',
+        readonly=True,
+    )
+    journal_id = fields.Many2one(
+        comodel_name='account.journal',
+        string='Journal',
+        readonly=True,
+    )
+    state = fields.Selection(
+        selection=[
+            ('queued', 'Queued'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+            ('reversed', 'Reversed'),
+        ],
+        default='running',
+        required=True,
+        readonly=True,
+        index=True,
+    )
+    error_message = fields.Text(readonly=True)
+    execution_key = fields.Char(
+        string='Execution Key',
+        readonly=True,
+        copy=False,
+        help='Hash of the workflow, source moves and parameters, preventing '
+             'the same execution from running twice. Executions without '
+             'source moves get a unique key unless one is given.',
+    )
+    import_line = fields.Integer(
+        string='File Line',
+        readonly=True,
+        help='Line of the imported file this execution comes from',
+    )
+    job_id = fields.Many2one(
+        comodel_name='account.move.workflow.job',
+        string='Queued Job',
+        readonly=True,
+        ondelete='cascade',
+        index='btree_not_null',
+    )
+    move_ids = fields.One2many(
+        comodel_name='account.move',
+        inverse_name='workflow_run_id',
+        string='Generated Journal Entries',
+        readonly=True,
+    )
+
+    _sql_constraints = [
+        ('execution_key_unique', 'unique(execution_key)',
+         'This workflow was already executed with the same parameters.'),
+    ]
+
+    @api.depends('workflow_id', 'source_move_id', 'date')
+    def _compute_display_name(self):
+        for run in self:
+            origin = run.source_move_id.name or fields.Date.to_string(run.date) or ''
+            run.display_name = '%s - %s' % (run.workflow_id.name or '', origin)
+
+    @api.model
+    def _create_claimed_runs(self, vals_list):
+        """Create the runs of execution keys claimed by
+        ``account.move.workflow._claim_execution_rows``.
+
+        A concurrent transaction may have committed a run for one of the keys
+        after the snapshot of this one was taken. The unique violation is
+        then raised as a serialization failure, so the request is retried
+        with a fresh snapshot and returns that run instead of an error."""
+        try:
+            return self.create(vals_list)
+        except UniqueViolation as e:
+            if e.diag.constraint_name != '%s_execution_key_unique' % self._table:
+                raise
+            raise SerializationFailure(str(e)) from e
+
+    @api.model
+    def _prepare_run_vals(self, workflow, row, state='running'):
+        """Values of the run record of one normalised parameter row"""
+        vals = {
+            'workflow_id': workflow.id,
+            'company_id': row['company'].id,
+            'source_move_id': row['source_move'].id,
+            'partner_id': row['partner'].id,
+            'amount': row['amount'],
+            'price_unit': row['price_unit'],
+            'currency_id': row['currency'].id,
+            'date': row['date'],
+            'reference': row['reference'],
+            'journal_id': row['journal'].id,
+            'execution_key': row['execution_key'],
+            'state': state,
+        }
+        if len(row['source_moves']) > 1:
+            vals['source_move_ids'] = [Command.set(row['source_moves'].ids)]
+        return vals
+
+    def _prepare_execution_values(self):
+        """Parameter row of a stored run, see
+        ``account.move.workflow._prepare_execution_row``"""
+        self.ensure_one()
+        return {
+            'source_move_id': self.source_move_id.id,
+            'source_move_ids': self.source_move_ids.ids,
+            'partner_id': self.partner_id.id,
+            'amount': self.amount,
+            'price_unit': self.price_unit,
+            'currency_id': self.currency_id.id,
+            'date': self.date,
+            'reference': self.reference or '',
+            'journal_id': self.journal_id.id,
+            'company_id': self.company_id.id,
+            'execution_key': self.execution_key,
+        }
+
+    def action_view_moves(self):
+        self.ensure_one()
+        return self.workflow_id._get_action_generated_moves(self.move_ids)
+
+    def action_open_reverse(self):
+        return {
+            'name': _('Reverse Workflow Executions'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.move.workflow.run.reverse',
+            'view_mode': 'form',
+            'target': 'new',
+            'context': {'active_model': self._name, 'active_ids': self.ids},
+        }
+
+    def _reverse(self, date=None, reason=None):
+        """Undo done runs: their draft entries are cancelled and their posted
+        entries reversed, with one ``_reverse_moves`` call per company and
+        reversal date whatever the number of runs. The reversals are linked
+        to the run of the entry they reverse.
+
+        ``date`` is the date of the reversals, the date of each entry when not
+        given. The runs become ``reversed`` and release their execution key
+        so the same parameters can be executed again. Returns the
+        reversals."""
+        runs = self.filtered(lambda r: r.state == 'done')
+        if not runs:
+            raise UserError(_("Only completed executions can be reversed."))
+        Move = self.env['account.move']
+        moves = runs.move_ids.filtered(lambda m: not m.reversed_entry_id)
+        moves.filtered(lambda m: m.state == 'draft').button_cancel()
+
+        move_ids_by_group = defaultdict(list)
+        for move in moves:
+            if move.state == 'posted' and not move.reversal_move_ids:
+                move_ids_by_group[move.company_id, date or move.date].append(move.id)
+
+        reversals = Move
+        for (company, reversal_date), move_ids in move_ids_by_group.items():
+            group = Move.browse(move_ids)
+            default_values_list = [{
+                'date': reversal_date,
+                'ref': (_('Reversal of: %(move)s, %(reason)s') % {'move': move.name, 'reason': reason}
+                        if reason else _('Reversal of: %s') % move.name),
+                'workflow_run_id': move.workflow_run_id.id,
+            } for move in group]
+            reversals |= group.with_company(company).with_context(
+                skip_workflow_triggers=True,
+            )._reverse_moves(default_values_list, cancel=True)
+
+        runs.write({'state': 'reversed', 'execution_key': False})
+        return reversals
@@ -1,6 +1,95 @@
-from odoo import _, api, fields, models
-from odoo.exceptions import ValidationError
-from odoo.tools.safe_eval import safe_eval
+import ast
+import logging
+from collections import namedtuple
+
+from odoo import _, api, fields, models, Command
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools.lru import LRU
+from odoo.tools.safe_eval import _BUILTINS, _SAFE_OPCODES, check_values, safe_eval, test_expr, unsafe_eval
+
+_logger = logging.getLogger(__name__)
+
+# Compiled and sandbox-checked conditions, overwrite values and template line
+# formulas, shared by all the environments of the process. Keys are
+# (template id, field, write_date), or ('account.move.template.line', line id,
+# write_date) for formulas; values are (source, code) so an unsaved change of
+# the source is never served from the cache.
+_EXPRESSION_CACHE = LRU(1024)
+
+# Variables of the evaluation context of conditions and overwrite values
+EXPRESSION_VARIABLES = (
+    'partner', 'amount', 'currency', 'date', 'source_name', 'previous_moves',
+    'env', 'user', 'company',
+)
+
+
+# Immutable description of one template of a workflow execution plan, see
+# account.move.workflow.template._prepare_execution_step
+ExecutionStep = namedtuple('ExecutionStep', [
+    'id', 'sequence', 'name', 'skip_on_error', 'target_company_id',
+    'journal_id', 'partner_id', 'move_type', 'date',
+    'condition', 'condition_code', 'condition_variables',
+    'overwrite_code', 'overwrite_variables',
+    'currency_id', 'input_sequences', 'formulas', 'line_templates', 'error',
+])
+# Static values of one template line, see _get_move_line_templates
+LineTemplate = namedtuple('LineTemplate', [
+    'sequence', 'debit', 'partner_id', 'payment_term_id', 'opt_account_id', 'vals',
+])
+
+
+def get_expression_variables(expr):
+    """Return the context variables read by a Python expression, found by
+    static analysis. Invalid expressions read nothing."""
+    if not expr:
+        return []
+    try:
+        tree = ast.parse(expr.strip(), mode='eval')
+    except SyntaxError:
+        return []
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    return [variable for variable in EXPRESSION_VARIABLES if variable in names]
+
+
+def compile_expression(key, expr):
+    """Return the sandbox-checked code object of ``expr``, compiled at most
+    once per cache ``key``"""
+    expr = expr.strip()
+    cached = _EXPRESSION_CACHE.get(key)
+    if cached and cached[0] == expr:
+        return cached[1]
+    code = test_expr(expr, _SAFE_OPCODES, mode='eval')
+    _EXPRESSION_CACHE[key] = (expr, code)
+    return code
+
+
+def eval_expression(code, eval_context):
+    """Evaluate a code object returned by ``compile_expression`` with the
+    builtins and the context checks of ``safe_eval``"""
+    check_values(eval_context)
+    return unsafe_eval(code, dict(eval_context, __builtins__=dict(_BUILTINS)))
+
+
+def get_formula_references(formula):
+    """Return the sequences of the template lines (``L<sequence>``) a
+    formula refers to"""
+    if not formula:
+        return set()
+    try:
+        tree = ast.parse(formula.strip(), mode='eval')
+    except SyntaxError:
+        return set()
+    return {
+        int(node.id[1:]) for node in ast.walk(tree)
+        if isinstance(node, ast.Name) and node.id[:1] == 'L' and node.id[1:].isdigit()
+    }
+
+
+def _clear_expression_cache(template_ids):
+    template_ids = set(template_ids)
+    for key in list(_EXPRESSION_CACHE):
+        if key[0] in template_ids:
+            _EXPRESSION_CACHE.pop(key, None)
 
 
 class AccountMoveWorkflowTemplate(models.Model):
@@ -27,6 +116,13 @@ class AccountMoveWorkflowTemplate(models.Model):
         help="Python condition to evaluate if this template should be applied. "
              "Available variables: partner, amount, currency, date, source_name, previous_moves"
     )
+    condition_variables = fields.Char(
+        string='Condition Depends On',
+        compute='_compute_condition_variables',
+        store=True,
+        help="Variables of the evaluation context read by the condition. The "
+             "condition is only re-evaluated when one of them changes."
+    )
     skip_on_error = fields.Boolean(
         string='Skip on Error',
         default=False,
@@ -88,6 +184,58 @@ class AccountMoveWorkflowTemplate(models.Model):
             except (SyntaxError, ValueError) as e:
                 raise ValidationError(_("Invalid Python syntax in overwrite values: %s\nError: %s") % (line.overwrite, str(e)))
     
+    @api.depends('condition')
+    def _compute_condition_variables(self):
+        for line in self:
+            line.condition_variables = ', '.join(get_expression_variables(line.condition))
+
+    def _get_condition_variables(self):
+        self.ensure_one()
+        return [variable.strip() for variable in (self.condition_variables or '').split(',') if variable.strip()]
+
+    def write(self, vals):
+        if 'condition' in vals or 'overwrite' in vals:
+            _clear_expression_cache(self.ids)
+        return super().write(vals)
+
+    def unlink(self):
+        _clear_expression_cache(self.ids)
+        return super().unlink()
+
+    def _get_compiled_expression(self, field_name):
+        """Return the sandbox-checked code object of ``field_name``
+        (``condition`` or ``overwrite``), compiling it at most once per
+        template version."""
+        self.ensure_one()
+        return compile_expression((self.id, field_name, self.write_date), self[field_name])
+
+    def _eval_expression(self, field_name, eval_context):
+        """Evaluate ``field_name`` like ``safe_eval`` would, reusing the
+        cached code object."""
+        return eval_expression(self._get_compiled_expression(field_name), eval_context)
+
+    def _eval_condition(self, eval_context, step=None):
+        self.ensure_one()
+        condition = step.condition if step else self.condition
+        if not condition:
+            return True
+        try:
+            if step:
+                return bool(eval_expression(step.condition_code, eval_context))
+            return bool(self._eval_expression('condition', eval_context))
+        except Exception as e:
+            raise UserError(_(
+                "Error evaluating condition: %(condition)s\nError: %(error)s"
+            ) % {'condition': condition, 'error': str(e)})
+
+    def _eval_overwrite(self, eval_context, step=None):
+        self.ensure_one()
+        if step:
+            return eval_expression(step.overwrite_code, eval_context) if step.overwrite_code else {}
+        if not self.overwrite:
+            return {}
+        return self._eval_expression('overwrite', eval_context)
+
     @api.onchange('template_id')
     def _onchange_template_id(self):
         if self.template_id:
@@ -111,4 +259,269 @@ class AccountMoveWorkflowTemplate(models.Model):
                 else:
                     record.target_company_id = record.template_id.company_id
             elif not record.use_template_company:
-                record.target_company_id = False
\ No newline at end of file
+                record.target_company_id = False
+
+    def _get_target_company_id(self):
+        """Company configured to receive the journal entry of this template,
+        False to use the company of the parameter row."""
+        self.ensure_one()
+        template = self.template_id
+        if self.target_company_id:
+            return self.target_company_id.id
+        if 'target_company_id' in template._fields and template.target_company_id:
+            return template.target_company_id.id
+        return False
+
+    def _get_amount_formulas(self):
+        """Return the sequences of the input lines of the template and the
+        compiled formulas of its computed lines, as (sequence, code) pairs
+        ordered so that every formula comes after the lines it refers to."""
+        self.ensure_one()
+        template_lines = self.template_id.line_ids
+        input_sequences = tuple(l.sequence for l in template_lines if l.type == 'input')
+        computed_lines = {l.sequence: l for l in template_lines if l.type == 'computed'}
+
+        pending = {
+            sequence: get_formula_references(line.python_code) & set(computed_lines)
+            for sequence, line in computed_lines.items()
+        }
+        formulas = []
+        while pending:
+            ready = sorted(sequence for sequence, references in pending.items() if not references)
+            if not ready:
+                raise UserError(_(
+                    "The formulas of the lines %(lines)s of template %(template)s refer to each other."
+                ) % {
+                    'lines': ', '.join('L%s' % sequence for sequence in sorted(pending)),
+                    'template': self.template_id.name,
+                })
+            for sequence in ready:
+                line = computed_lines[sequence]
+                formulas.append((sequence, compile_expression(
+                    ('account.move.template.line', line.id, line.write_date), line.python_code or '0.0'
+                )))
+                del pending[sequence]
+            for references in pending.values():
+                references.difference_update(ready)
+        return input_sequences, tuple(formulas)
+
+    def _get_move_line_templates(self):
+        """Static part of the move line values of the template, shared by
+        every parameter row.
+
+        Mirrors ``account.move.template.run._prepare_move_line``; the base tax
+        tags of all the lines are fetched with a single search."""
+        self.ensure_one()
+        template_lines = self.template_id.line_ids
+        taxes = template_lines.mapped('tax_ids')
+        base_repartition_lines = self.env['account.tax.repartition.line']
+        if taxes:
+            base_repartition_lines = base_repartition_lines.search([
+                ('tax_id', 'in', taxes.ids),
+                ('repartition_type', '=', 'base'),
+            ])
+
+        line_templates = []
+        for tmpl_line in template_lines:
+            vals = {
+                'name': tmpl_line.name,
+                'analytic_distribution': tmpl_line.analytic_distribution,
+                'account_id': tmpl_line.account_id.id,
+                'tax_repartition_line_id': tmpl_line.tax_repartition_line_id.id or False,
+            }
+            if tmpl_line.tax_ids:
+                document_type = 'refund' if tmpl_line.is_refund else 'invoice'
+                tags = base_repartition_lines.filtered(
+                    lambda r: r.tax_id in tmpl_line.tax_ids and r.document_type == document_type
+                ).mapped('tag_ids')
+                vals['tax_ids'] = [Command.set(tmpl_line.tax_ids.ids)]
+                vals['tax_tag_ids'] = [Command.set(tags.ids)]
+            if tmpl_line.tax_repartition_line_id:
+                vals['tax_tag_ids'] = [Command.set(tmpl_line.tax_repartition_line_id.tag_ids.ids)]
+            line_templates.append(LineTemplate(
+                sequence=tmpl_line.sequence,
+                debit=tmpl_line.move_line_type == 'dr',
+                partner_id=tmpl_line.partner_id.id,
+                payment_term_id=tmpl_line.payment_term_id.id,
+                opt_account_id=tmpl_line.opt_account_id.id,
+                vals=tuple(vals.items()),
+            ))
+        return tuple(line_templates)
+
+    def _prepare_execution_step(self):
+        """Resolve everything the execution needs from this template into an
+        immutable ``ExecutionStep``. Configuration errors are kept in the
+        step and reported when it is executed."""
+        self.ensure_one()
+        template = self.template_id
+        values = {
+            'id': self._origin.id,
+            'sequence': self.sequence,
+            'name': template.name,
+            'skip_on_error': self.skip_on_error,
+            'target_company_id': self._get_target_company_id(),
+            'journal_id': template.journal_id.id,
+            'partner_id': template.partner_id.id if 'partner_id' in template._fields else False,
+            'move_type': template.move_type if 'move_type' in template._fields else False,
+            'date': template.date if 'date' in template._fields else False,
+            'condition': self.condition or False,
+            'condition_code': None,
+            'condition_variables': tuple(self._get_condition_variables()),
+            'overwrite_code': None,
+            'overwrite_variables': tuple(get_expression_variables(self.overwrite)),
+            'currency_id': template.company_id.currency_id.id,
+            'input_sequences': (),
+            'formulas': (),
+            'line_templates': (),
+            'error': False,
+        }
+        try:
+            if self.condition:
+                values['condition_code'] = self._get_compiled_expression('condition')
+            if self.overwrite:
+                values['overwrite_code'] = self._get_compiled_expression('overwrite')
+            values['input_sequences'], values['formulas'] = self._get_amount_formulas()
+            values['line_templates'] = self._get_move_line_templates()
+        except Exception as e:
+            values['error'] = str(e)
+        return ExecutionStep(**values)
+
+    def _get_execution_step(self):
+        """Step of this template in the cached execution plan of its
+        workflow"""
+        self.ensure_one()
+        if self._origin.id and self.workflow_id._origin.id:
+            for step in self.workflow_id._origin._get_execution_plan():
+                if step.id == self._origin.id:
+                    return step
+        return self._prepare_execution_step()
+
+    def _compute_amounts(self, amounts, step=None):
+        """Compute the amount of every line of the template for a batch of
+        input amounts, the first input line receiving the amount as
+        ``load_lines`` does.
+
+        Each formula is evaluated for all the amounts in a single pass.
+        Returns one ``{sequence: amount}`` dict per amount, or the
+        ``UserError`` raised by the formulas for that amount."""
+        self.ensure_one()
+        step = step or self._get_execution_step()
+        if step.error:
+            raise UserError(step.error)
+        currency = self.env['res.currency'].browse(step.currency_id)
+        results = []
+        for amount in amounts:
+            sequence2amount = dict.fromkeys(step.input_sequences, 0.0)
+            if step.input_sequences:
+                sequence2amount[step.input_sequences[0]] = amount
+            results.append(sequence2amount)
+
+        contexts = [
+            {'L%s' % sequence: value for sequence, value in sequence2amount.items()}
+            for sequence2amount in results
+        ]
+        for sequence, code in step.formulas:
+            for index, eval_context in enumerate(contexts):
+                if isinstance(results[index], Exception):
+                    continue
+                try:
+                    value = unsafe_eval(code, {'__builtins__': dict(_BUILTINS)}, eval_context)
+                except Exception as e:
+                    results[index] = UserError(_(
+                        "Impossible to compute the formula of line with sequence %(sequence)s: %(error)s"
+                    ) % {'sequence': sequence, 'error': e})
+                    continue
+                value = currency.round(value)
+                results[index][sequence] = value
+                eval_context['L%s' % sequence] = value
+        return results
+
+    def _prepare_move_vals(self, row, eval_context, step=None, sequence2amount=None):
+        """Return the values of the journal entry generated by this template
+        for one normalised parameter ``row`` (see
+        ``account.move.workflow._prepare_execution_row``).
+
+        The values are built in memory with the same amounts, taxes and
+        partners ``account.move.template.run.generate_move`` would use, so no
+        transient record is involved. ``sequence2amount`` holds the line
+        amounts of the row when already computed by ``_compute_amounts``."""
+        self.ensure_one()
+        step = step or self._get_execution_step()
+        if step.error:
+            raise UserError(step.error)
+
+        company = self.env['res.company'].browse(step.target_company_id or row['company'].id)
+        date = step.date or row['date']
+        partner = row['partner'] or self.env['res.partner'].browse(step.partner_id)
+        overwrite = self._eval_overwrite(eval_context, step)
+
+        if sequence2amount is None:
+            sequence2amount = self._compute_amounts([row['amount']], step)[0]
+        if isinstance(sequence2amount, Exception):
+            raise sequence2amount
+
+        company_cur = company.currency_id
+        if all(company_cur.is_zero(amount) for amount in sequence2amount.values()):
+            raise UserError(_("Debit and credit of all lines are null."))
+
+        move_vals = {
+            'ref': row['reference'],
+            'journal_id': step.journal_id or row['journal'].id,
+            'date': fields.Date.to_string(date),
+            'company_id': company.id,
+            'line_ids': [],
+        }
+        if step.move_type:
+            move_vals['move_type'] = step.move_type
+            if step.move_type != 'entry':
+                move_vals['partner_id'] = partner.id
+
+        for line_template in step.line_templates:
+            amount = sequence2amount[line_template.sequence]
+            if company_cur.is_zero(amount):
+                continue
+            line_vals = self._prepare_move_line_vals(line_template, amount, partner, date, company)
+            line_vals.update(overwrite.get('L%s' % line_template.sequence, {}))
+            self._update_account_on_negative(line_template, line_vals)
+            if row['price_unit']:
+                line_vals['price_unit'] = row['price_unit']
+            move_vals['line_ids'].append(Command.create(line_vals))
+        return move_vals
+
+    def _prepare_move_line_vals(self, line_template, amount, partner, date, company):
+        debit = line_template.debit
+        vals = dict(line_template.vals)
+        vals.update({
+            'credit': not debit and amount or 0.0,
+            'debit': debit and amount or 0.0,
+            'partner_id': partner.id or line_template.partner_id,
+            'date_maturity': self._get_date_maturity(line_template.payment_term_id, amount, date, company),
+        })
+        return vals
+
+    def _get_date_maturity(self, payment_term_id, amount, date, company):
+        if not payment_term_id:
+            return date
+        terms = self.env['account.payment.term'].browse(payment_term_id)._compute_terms(
+            date_ref=date,
+            currency=company.currency_id,
+            company=company,
+            tax_amount=0.0,
+            tax_amount_currency=0.0,
+            sign=1,
+            untaxed_amount=amount,
+            untaxed_amount_currency=amount,
+        )
+        return max(term['date'] for term in terms['line_ids'])
+
+    def _update_account_on_negative(self, line_template, vals):
+        """Use the optional account of the template line when the amount is
+        negative, like the template run does"""
+        if not line_template.opt_account_id:
+            return
+        for key in ('debit', 'credit'):
+            if vals[key] < 0:
+                other_key = 'credit' if key == 'debit' else 'debit'
+                vals['account_id'] = line_template.opt_account_id
+                vals[other_key] = abs(vals[key])
+                vals[key] = 0
@@ -0,0 +1,140 @@
+from collections import defaultdict, namedtuple
+
+from odoo import api, fields, models, tools, _
+from odoo.exceptions import ValidationError
+
+# Trigger rule as stored in the matching index
+TriggerRule = namedtuple('TriggerRule', [
+    'id', 'workflow_id', 'partner_category_ids', 'amount_min', 'amount_max', 'execution_mode',
+])
+
+
+class AccountMoveWorkflowTrigger(models.Model):
+    _name = 'account.move.workflow.trigger'
+    _description = 'Accounting Workflow Trigger'
+    _order = 'workflow_id, sequence, id'
+
+    workflow_id = fields.Many2one(
+        comodel_name='account.move.workflow',
+        string='Workflow',
+        required=True,
+        ondelete='cascade',
+        index=True,
+    )
+    sequence = fields.Integer(default=10)
+    active = fields.Boolean(default=True)
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        related='workflow_id.company_id',
+        store=True,
+    )
+    journal_ids = fields.Many2many(
+        comodel_name='account.journal',
+        string='Journals',
+        help='Leave empty to match every journal',
+    )
+    move_type = fields.Selection(
+        selection=lambda self: self.env['account.move']._fields['move_type'].selection,
+        string='Move Type',
+        help='Leave empty to match every type',
+    )
+    partner_category_ids = fields.Many2many(
+        comodel_name='res.partner.category',
+        string='Partner Tags',
+        help='If set, the partner of the entry must have one of these tags',
+    )
+    amount_min = fields.Monetary(
+        string='Minimum Amount',
+        currency_field='currency_id',
+    )
+    amount_max = fields.Monetary(
+        string='Maximum Amount',
+        currency_field='currency_id',
+        help='Leave to zero for no maximum',
+    )
+    currency_id = fields.Many2one(
+        comodel_name='res.currency',
+        related='workflow_id.currency_id',
+    )
+    execution_mode = fields.Selection(
+        selection=[
+            ('immediate', 'Execute when posting'),
+            ('queue', 'Queue for background execution'),
+        ],
+        string='Execution',
+        required=True,
+        default='immediate',
+    )
+
+    @api.constrains('amount_min', 'amount_max')
+    def _check_amount_range(self):
+        for trigger in self:
+            if trigger.amount_max and trigger.amount_max < trigger.amount_min:
+                raise ValidationError(_('The maximum amount of a trigger must be greater than its minimum amount.'))
+
+    @api.model
+    def _get_trigger_index(self):
+        """Return the active trigger rules indexed by
+        (company id, journal id, move type), where False stands for a rule
+        matching any value of the key part.
+
+        The index is cached in the registry, keyed by the number and write
+        dates of the triggers and their workflows."""
+        return self._get_cached_trigger_index(self._get_trigger_index_key())
+
+    @api.model
+    def _get_trigger_index_key(self):
+        self.flush_model()
+        self.env['account.move.workflow'].flush_model(['active', 'company_id'])
+        self.env.cr.execute("""
+               SELECT COUNT(t.id), MAX(t.id), MAX(t.write_date), MAX(w.write_date)
+                 FROM account_move_workflow_trigger t
+                 JOIN account_move_workflow w ON w.id = t.workflow_id
+        """)
+        return tuple(self.env.cr.fetchone())
+
+    @api.model
+    @tools.ormcache('key')
+    def _get_cached_trigger_index(self, key):
+        index = defaultdict(list)
+        triggers = self.sudo().search([('workflow_id.active', '=', True)])
+        for trigger in triggers:
+            rule = TriggerRule(
+                id=trigger.id,
+                workflow_id=trigger.workflow_id.id,
+                partner_category_ids=frozenset(trigger.partner_category_ids.ids),
+                amount_min=trigger.amount_min,
+                amount_max=trigger.amount_max,
+                execution_mode=trigger.execution_mode,
+            )
+            for journal_id in trigger.journal_ids.ids or [False]:
+                index[trigger.company_id.id, journal_id, trigger.move_type or False].append(rule)
+        return {key: tuple(rules) for key, rules in index.items()}
+
+    @api.model
+    def _match_moves(self, moves):
+        """Return the matching rules of each move as {move: rules}, looking
+        up the index instead of evaluating every trigger"""
+        index = self._get_trigger_index()
+        if not index:
+            return {}
+        matches = {}
+        for move in moves:
+            rules = []
+            for company_id in (move.company_id.id, False):
+                for journal_id in (move.journal_id.id, False):
+                    for move_type in (move.move_type, False):
+                        rules.extend(index.get((company_id, journal_id, move_type), ()))
+            rules = [rule for rule in rules if self._rule_matches(rule, move)]
+            if rules:
+                matches[move] = rules
+        return matches
+
+    @api.model
+    def _rule_matches(self, rule, move):
+        amount = move.amount_total
+        if amount < rule.amount_min or (rule.amount_max and amount > rule.amount_max):
+            return False
+        if rule.partner_category_ids and not rule.partner_category_ids.intersection(move.partner_id.category_id.ids):
+            return False
+        return True
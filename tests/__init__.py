@@ -0,0 +1,3 @@
+from . import test_workflow_benchmark
+from . import test_workflow_execution
+from . import test_workflow_recurrence
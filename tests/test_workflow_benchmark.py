@@ -0,0 +1,220 @@
+import logging
+import time
+
+from odoo import Command
+from odoo.tests import Form, tagged
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', 'workflow_benchmark')
+class TestWorkflowBenchmark(AccountTestInvoicingCommon):
+    """Query-count and timing budgets of the workflow execution paths.
+
+    Synthetic workflows of 1, 10 and 100 templates with 5 or 50 lines each,
+    spread over two companies, are measured. Budgets are expressed relative
+    to the smallest workflow so that any query count growing with the number
+    of templates, lines or rows where it should not fails the build."""
+
+    # Queries allowed on top of the smallest workflow for the paths whose
+    # query count must not depend on the size of the workflow
+    QUERY_MARGIN = 20
+    # Queries allowed for each template added to an execution: its moves are
+    # created with those of the other templates, one create per company
+    TEMPLATE_QUERY_BUDGET = 10
+    # Synthetic workflows, by (template count, line count)
+    WORKFLOW_SIZES = [(1, 5), (10, 5), (100, 5), (1, 50), (10, 50), (100, 50)]
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company_data_2 = cls.setup_other_company()
+        cls.env.user.company_ids |= cls.company_data_2['company']
+        cls.env = cls.env(context=dict(
+            cls.env.context,
+            allowed_company_ids=(cls.company_data['company'] | cls.company_data_2['company']).ids,
+        ))
+        # Built once for the class: records created by a test method are
+        # rolled back when it ends
+        cls.workflows = {size: cls._create_workflow(*size) for size in cls.WORKFLOW_SIZES}
+
+    @classmethod
+    def _create_move_templates(cls, template_count, line_count):
+        """Balanced templates alternating between the two companies: one
+        input debit line and ``line_count - 1`` computed credit lines."""
+        companies = [cls.company_data, cls.company_data_2]
+        credit_sequences = range(2, line_count + 1)
+        vals_list = []
+        for index in range(template_count):
+            company_data = companies[index % len(companies)]
+            line_vals = [Command.create({
+                'sequence': 1,
+                'name': 'L1',
+                'account_id': company_data['default_account_expense'].id,
+                'move_line_type': 'dr',
+                'type': 'input',
+            })]
+            for sequence in credit_sequences:
+                if sequence == line_count:
+                    formula = 'L1 - (%s)' % ' + '.join('L%s' % s for s in credit_sequences if s != line_count) \
+                        if line_count > 2 else 'L1'
+                else:
+                    formula = 'round(L1 / %s, 2)' % (line_count - 1)
+                line_vals.append(Command.create({
+                    'sequence': sequence,
+                    'name': 'L%s' % sequence,
+                    'account_id': company_data['default_account_revenue'].id,
+                    'move_line_type': 'cr',
+                    'type': 'computed',
+                    'python_code': formula,
+                }))
+            vals_list.append({
+                'name': 'Benchmark %s/%s/%s' % (template_count, line_count, index),
+                'company_id': company_data['company'].id,
+                'journal_id': company_data['default_journal_misc'].id,
+                'line_ids': line_vals,
+            })
+        return cls.env['account.move.template'].create(vals_list)
+
+    @classmethod
+    def _create_workflow(cls, template_count, line_count):
+        templates = cls._create_move_templates(template_count, line_count)
+        # Shared between the companies since its steps target both
+        return cls.env['account.move.workflow'].create({
+            'name': 'Benchmark %s templates x %s lines' % (template_count, line_count),
+            'company_id': False,
+            'workflow_template_ids': [
+                Command.create({
+                    'sequence': index + 1,
+                    'template_id': template.id,
+                    'use_template_company': True,
+                    'target_company_id': template.company_id.id,
+                    'condition': 'amount > 0',
+                })
+                for index, template in enumerate(templates)
+            ],
+        })
+
+    def _get_workflow(self, template_count, line_count):
+        return self.workflows[template_count, line_count]
+
+    def _measure(self, label, func):
+        """Run ``func`` on a cold cache and return its query count"""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        query_start = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        func()
+        self.env.flush_all()
+        duration = time.perf_counter() - start
+        query_count = self.env.cr.sql_log_count - query_start
+        _logger.info("Workflow benchmark - %s: %s queries, %.3fs", label, query_count, duration)
+        return query_count
+
+    def _open_wizard(self, workflow):
+        wizard_form = Form(self.env['account.move.workflow.wizard'])
+        wizard_form.workflow_id = workflow
+        return wizard_form
+
+    def _execution_rows(self, count, prefix='BENCH'):
+        """Parameter rows with references unique to ``prefix``, so that
+        batches measured one after the other are not deduplicated by their
+        execution keys"""
+        return [{
+            'partner_id': self.partner_a.id,
+            'amount': 1000.0 + index,
+            'date': '2019-01-01',
+            'reference': '%s/%s' % (prefix, index),
+        } for index in range(count)]
+
+    def test_onchange_workflow(self):
+        counts = {}
+        for template_count, line_count in self.WORKFLOW_SIZES:
+            workflow = self._get_workflow(template_count, line_count)
+            counts[template_count, line_count] = self._measure(
+                '_onchange_workflow %s templates x %s lines' % (template_count, line_count),
+                lambda: self._open_wizard(workflow),
+            )
+        for size, count in counts.items():
+            self.assertLessEqual(
+                count, counts[1, 5] + self.QUERY_MARGIN,
+                "Loading the wizard of %s templates x %s lines should not add queries per template or line" % size,
+            )
+
+    def test_onchange_parameters(self):
+        counts = {}
+        for template_count, line_count in [(1, 5), (100, 5), (100, 50)]:
+            wizard_form = self._open_wizard(self._get_workflow(template_count, line_count))
+
+            def change_parameters():
+                wizard_form.partner_id = self.partner_a
+                wizard_form.amount = 500.0
+                wizard_form.date = '2019-01-15'
+
+            counts[template_count, line_count] = self._measure(
+                '_onchange_parameters %s templates x %s lines' % (template_count, line_count),
+                change_parameters,
+            )
+        for size, count in counts.items():
+            self.assertLessEqual(
+                count, counts[1, 5] + self.QUERY_MARGIN,
+                "Changing the parameters of %s templates x %s lines should not add queries per template" % size,
+            )
+
+    def test_action_execute(self):
+        counts = {}
+        for template_count in (1, 10, 100):
+            workflow = self._get_workflow(template_count, 5)
+            wizard = self.env['account.move.workflow.wizard'].create({
+                'workflow_id': workflow.id,
+                'company_id': self.company_data['company'].id,
+                'partner_id': self.partner_a.id,
+                'amount': 1000.0,
+                'date': '2019-01-01',
+            })
+            counts[template_count] = self._measure(
+                'action_execute %s templates x 5 lines' % template_count,
+                wizard.action_execute,
+            )
+            self.assertEqual(len(workflow.generated_move_ids), template_count)
+        # the fixed cost of the execution cancels out: only the increment
+        # per template is budgeted
+        self.assertLessEqual(
+            (counts[100] - counts[10]) / 90, self.TEMPLATE_QUERY_BUDGET,
+            "Each template added to an execution should cost at most %s queries" % self.TEMPLATE_QUERY_BUDGET,
+        )
+        self.assertLessEqual(
+            (counts[10] - counts[1]) / 9, self.TEMPLATE_QUERY_BUDGET,
+            "Each template added to an execution should cost at most %s queries" % self.TEMPLATE_QUERY_BUDGET,
+        )
+
+    def test_batch_execution(self):
+        workflow = self._get_workflow(10, 5)
+        created = {}
+
+        def execute(label, rows, **kwargs):
+            created[label] = workflow._execute_batch(rows, **kwargs)
+
+        single_count = self._measure(
+            'execute_batch 1 row x 10 templates',
+            lambda: execute('single', self._execution_rows(1, 'SINGLE')),
+        )
+        batch_count = self._measure(
+            'execute_batch 50 rows x 10 templates',
+            lambda: execute('batch', self._execution_rows(50, 'BATCH')),
+        )
+        self.assertLessEqual(
+            batch_count, 50 * single_count / 2,
+            "A batch of 50 rows should cost far less than 50 separate executions",
+        )
+        deferred_count = self._measure(
+            'execute_batch 50 rows x 10 templates, deferred posting',
+            lambda: execute('deferred', self._execution_rows(50, 'DEFERRED'), post_mode='deferred'),
+        )
+        self.assertLessEqual(deferred_count, batch_count + self.QUERY_MARGIN)
+        self.assertEqual(len(created['single']), 10)
+        self.assertEqual(len(created['batch']), 500)
+        self.assertEqual(len(created['deferred']), 500)
+        self.assertEqual(set(created['deferred'].mapped('state')), {'posted'})
@@ -0,0 +1,259 @@
+from odoo import Command, fields
+from odoo.tests import new_test_user, tagged
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+@tagged('post_install', '-at_install')
+class TestWorkflowExecution(AccountTestInvoicingCommon):
+    """The entries built in memory by the workflow must be the entries the
+    template run of account_move_template generates."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        tax = cls.company_data['default_tax_sale']
+        tax_repartition_line = tax.invoice_repartition_line_ids.filtered(
+            lambda line: line.repartition_type == 'tax'
+        )
+        # 1150 in: 1000 of taxed revenue, 150 of tax and a negative line of
+        # -10 moved to its optional account, balanced by a last line of 10
+        cls.move_template = cls.env['account.move.template'].create({
+            'name': 'Taxed sale',
+            'company_id': cls.company_data['company'].id,
+            'journal_id': cls.company_data['default_journal_misc'].id,
+            'line_ids': [
+                Command.create({
+                    'sequence': 1,
+                    'name': 'Receivable',
+                    'account_id': cls.company_data['default_account_receivable'].id,
+                    'move_line_type': 'dr',
+                    'type': 'input',
+                    'payment_term_id': cls.env.ref('account.account_payment_term_30days').id,
+                }),
+                Command.create({
+                    'sequence': 2,
+                    'name': 'Revenue',
+                    'account_id': cls.company_data['default_account_revenue'].id,
+                    'move_line_type': 'cr',
+                    'type': 'computed',
+                    'python_code': 'round(L1 / 1.15, 2)',
+                    'tax_ids': [Command.set(tax.ids)],
+                }),
+                Command.create({
+                    'sequence': 3,
+                    'name': 'Tax',
+                    'account_id': tax_repartition_line.account_id.id,
+                    'move_line_type': 'cr',
+                    'type': 'computed',
+                    'python_code': 'round(L2 * 0.15, 2)',
+                    'tax_repartition_line_id': tax_repartition_line.id,
+                }),
+                Command.create({
+                    'sequence': 4,
+                    'name': 'Adjustment',
+                    'account_id': cls.company_data['default_account_revenue'].id,
+                    'opt_account_id': cls.company_data['default_account_expense'].id,
+                    'move_line_type': 'cr',
+                    'type': 'computed',
+                    'python_code': 'L1 - L2 - L3 - 10',
+                }),
+                Command.create({
+                    'sequence': 5,
+                    'name': 'Counterpart',
+                    'account_id': cls.company_data['default_account_revenue'].id,
+                    'move_line_type': 'cr',
+                    'type': 'computed',
+                    'python_code': '10.0',
+                }),
+            ],
+        })
+        cls.workflow = cls.env['account.move.workflow'].create({
+            'name': 'Taxed sale',
+            'company_id': cls.company_data['company'].id,
+            'workflow_template_ids': [Command.create({
+                'sequence': 1,
+                'template_id': cls.move_template.id,
+            })],
+        })
+
+    def _create_trigger(self, execution_mode):
+        return self.env['account.move.workflow.trigger'].create({
+            'workflow_id': self.workflow.id,
+            'journal_ids': [Command.set(self.company_data['default_journal_sale'].ids)],
+            'move_type': 'out_invoice',
+            'execution_mode': execution_mode,
+        })
+
+    def _post_as_billing_user(self):
+        """Post a 1150 invoice as a user without any access to the workflows"""
+        billing_user = new_test_user(
+            self.env, login='workflow_billing', groups='account.group_account_invoice',
+            company_id=self.company_data['company'].id, company_ids=self.company_data['company'].ids,
+        )
+        invoice = self.init_invoice(
+            'out_invoice', partner=self.partner_a, invoice_date='2025-01-15',
+            amounts=[1000.0], taxes=self.company_data['default_tax_sale'],
+        )
+        invoice.with_user(billing_user).action_post()
+        self.assertEqual(invoice.state, 'posted')
+        return invoice
+
+    def _get_line_values(self, move):
+        return sorted(
+            (
+                line.name or '',
+                line.account_id.id,
+                line.partner_id.id,
+                line.debit,
+                line.credit,
+                tuple(line.tax_ids.ids),
+                line.tax_line_id.id,
+                line.date_maturity,
+            )
+            for line in move.line_ids
+        )
+
+    def test_prepare_move_vals_matches_template_run(self):
+        date = fields.Date.to_date('2025-01-15')
+
+        template_run = self.env['account.move.template.run'].create({
+            'template_id': self.move_template.id,
+            'partner_id': self.partner_a.id,
+            'date': date,
+            'ref': 'REF/1',
+        })
+        template_run.load_lines()
+        template_run.line_ids.filtered(lambda line: line.sequence == 1).amount = 1150.0
+        expected_move = self.env['account.move'].browse(template_run.generate_move()['res_id'])
+
+        row = self.workflow._prepare_execution_row({
+            'partner_id': self.partner_a.id,
+            'amount': 1150.0,
+            'date': date,
+            'reference': 'REF/1',
+        })
+        move_vals = self.workflow.workflow_template_ids._prepare_move_vals(row, self.workflow._get_eval_context(row))
+        move = self.env['account.move'].create(move_vals)
+
+        self.assertEqual(move.ref, expected_move.ref)
+        self.assertEqual(move.date, expected_move.date)
+        self.assertEqual(move.journal_id, expected_move.journal_id)
+        self.assertEqual(self._get_line_values(move), self._get_line_values(expected_move))
+        # the negative adjustment went to the optional account
+        self.assertIn(
+            self.company_data['default_account_expense'],
+            move.line_ids.filtered(lambda line: line.debit == 10.0).account_id,
+        )
+        self.assertEqual(
+            move.line_ids.filtered(lambda line: line.name == 'Receivable').date_maturity,
+            fields.Date.to_date('2025-02-14'),
+        )
+
+    def test_trigger_posted_by_billing_user(self):
+        self._create_trigger('immediate')
+        invoice = self._post_as_billing_user()
+        run = self.env['account.move.workflow.run'].search([('source_move_id', '=', invoice.id)])
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(len(run.move_ids), 1)
+
+    def test_trigger_queued_by_billing_user(self):
+        self._create_trigger('queue')
+        invoice = self._post_as_billing_user()
+        run = self.env['account.move.workflow.run'].search([('source_move_id', '=', invoice.id)])
+        self.assertEqual(run.state, 'queued')
+        # the job doesn't run with the rights of the user who posted
+        self.assertEqual(run.job_id.user_id, self.env.ref('base.user_root'))
+        run.job_id._process()
+        self.assertEqual(run.state, 'done')
+
+    def _execution_row(self, **values):
+        return dict({
+            'partner_id': self.partner_a.id,
+            'amount': 1150.0,
+            'date': '2025-01-15',
+            'reference': 'REF/1',
+        }, **values)
+
+    def test_source_executed_once(self):
+        invoice = self.init_invoice(
+            'out_invoice', partner=self.partner_a, invoice_date='2025-01-15',
+            amounts=[1000.0], taxes=self.company_data['default_tax_sale'], post=True,
+        )
+        moves = self.workflow._execute_batch([{'source_move_id': invoice.id}])
+        self.assertEqual(len(moves), 1)
+        self.assertEqual(self.workflow._execute_batch([{'source_move_id': invoice.id}]), moves)
+        self.assertEqual(
+            self.env['account.move.workflow.run'].search_count([('workflow_id', '=', self.workflow.id)]), 1,
+        )
+
+    def test_identical_rows_without_source(self):
+        row = self._execution_row()
+        self.assertEqual(len(self.workflow._execute_batch([row, row])), 2)
+        # an explicit key makes them the same execution
+        row = self._execution_row(execution_key='REF/1')
+        moves = self.workflow._execute_batch([row, row])
+        self.assertEqual(len(moves), 1)
+        self.assertEqual(self.workflow._execute_batch([row]), moves)
+
+    def test_failed_run_retried(self):
+        row = self._execution_row(partner_id=False, execution_key='RETRY/1')
+        self.workflow.partner_required = True
+        job = self.workflow._enqueue_batch([row])
+        job._process()
+        run = job.run_ids
+        self.assertEqual(run.state, 'failed')
+
+        self.workflow.partner_required = False
+        moves = self.workflow._execute_batch([row])
+        self.assertEqual(run.state, 'done')
+        self.assertEqual(moves, run.move_ids)
+        self.assertEqual(len(moves), 1)
+
+    def test_reversed_run_releases_key(self):
+        row = self._execution_row(execution_key='REVERSE/1')
+        moves = self.workflow._execute_batch([row])
+        run = moves.workflow_run_id
+        run._reverse()
+        self.assertEqual(run.state, 'reversed')
+        self.assertFalse(run.execution_key)
+
+        new_moves = self.workflow._execute_batch([row])
+        self.assertEqual(len(new_moves), 1)
+        self.assertNotEqual(new_moves, moves)
+        self.assertNotEqual(new_moves.workflow_run_id, run)
+
+    def test_consolidation(self):
+        workflow = self.env['account.move.workflow'].create({
+            'name': 'Consolidated taxed sale',
+            'company_id': self.company_data['company'].id,
+            'consolidate': True,
+            'consolidate_by_partner': True,
+            'consolidate_by_date': True,
+            'workflow_template_ids': [Command.create({
+                'sequence': 1,
+                'template_id': self.move_template.id,
+            })],
+        })
+        invoices = self.env['account.move'].concat(*(
+            self.init_invoice(
+                'out_invoice', partner=partner, invoice_date='2025-01-15',
+                amounts=[1000.0], taxes=self.company_data['default_tax_sale'], post=True,
+            )
+            for partner in (self.partner_a, self.partner_a, self.partner_b)
+        ))
+        rows = [invoice._prepare_workflow_row() for invoice in invoices]
+
+        moves = workflow._execute_batch(rows)
+        self.assertEqual(len(moves), 2)
+        run_a = moves.workflow_run_id.filtered(lambda run: run.partner_id == self.partner_a)
+        self.assertEqual(run_a.source_move_ids, invoices[:2])
+        self.assertEqual(run_a.amount, 2300.0)
+        # the unit price defaulted by each invoice is not carried to the group
+        self.assertEqual(run_a.price_unit, 2300.0)
+        run_b = moves.workflow_run_id - run_a
+        self.assertEqual(run_b.source_move_id, invoices[2])
+
+        # resubmitted sources return the moves of their consolidated runs
+        self.assertEqual(workflow._execute_batch(rows), moves)
+        self.assertEqual(workflow._execute_batch(rows[:1]), run_a.move_ids)
@@ -0,0 +1,102 @@
+from freezegun import freeze_time
+
+from odoo import Command, fields
+from odoo.tests import tagged
+
+from odoo.addons.account.tests.common import AccountTestInvoicingCommon
+
+
+@tagged('post_install', '-at_install')
+class TestWorkflowRecurrence(AccountTestInvoicingCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        move_template = cls.env['account.move.template'].create({
+            'name': 'Monthly accrual',
+            'company_id': cls.company_data['company'].id,
+            'journal_id': cls.company_data['default_journal_misc'].id,
+            'line_ids': [
+                Command.create({
+                    'sequence': 1,
+                    'name': 'Expense',
+                    'account_id': cls.company_data['default_account_expense'].id,
+                    'move_line_type': 'dr',
+                    'type': 'input',
+                }),
+                Command.create({
+                    'sequence': 2,
+                    'name': 'Accrual',
+                    'account_id': cls.company_data['default_account_revenue'].id,
+                    'move_line_type': 'cr',
+                    'type': 'computed',
+                    'python_code': 'L1',
+                }),
+            ],
+        })
+        cls.workflow = cls.env['account.move.workflow'].create({
+            'name': 'Monthly accrual',
+            'company_id': cls.company_data['company'].id,
+            'recurrence': 'monthly',
+            'recurrence_day': 31,
+            'recurrence_next_date': '2025-01-31',
+            'recurrence_partner_id': cls.partner_a.id,
+            'recurrence_amount': 100.0,
+            'workflow_template_ids': [Command.create({
+                'sequence': 1,
+                'template_id': move_template.id,
+            })],
+        })
+
+    def _get_generated_dates(self):
+        moves = self.env['account.move'].search([('workflow_id', '=', self.workflow.id)], order='date')
+        return [fields.Date.to_string(date) for date in moves.mapped('date')]
+
+    def _next_dates(self, date, count):
+        dates = []
+        date = fields.Date.to_date(date)
+        for __ in range(count):
+            date = self.workflow._get_next_recurrence_date(date)
+            dates.append(fields.Date.to_string(date))
+        return dates
+
+    def test_monthly_day_31(self):
+        # short months end the period on their last day without losing the 31st
+        self.assertEqual(
+            self._next_dates('2025-01-31', 4),
+            ['2025-02-28', '2025-03-31', '2025-04-30', '2025-05-31'],
+        )
+        self.assertEqual(
+            self.workflow._get_first_recurrence_date(fields.Date.to_date('2024-02-10')),
+            fields.Date.to_date('2024-02-29'),
+        )
+
+    def test_month_end(self):
+        self.workflow.recurrence = 'month_end'
+        self.assertEqual(
+            self._next_dates('2024-01-31', 3),
+            ['2024-02-29', '2024-03-31', '2024-04-30'],
+        )
+        self.assertEqual(
+            self.workflow._get_first_recurrence_date(fields.Date.to_date('2025-02-01')),
+            fields.Date.to_date('2025-02-28'),
+        )
+
+    @freeze_time('2025-04-15')
+    def test_cron_catches_up_missed_periods(self):
+        self.env['account.move.workflow']._cron_execute_recurring()
+        self.assertEqual(self._get_generated_dates(), ['2025-01-31', '2025-02-28', '2025-03-31'])
+        self.assertEqual(self.workflow.recurrence_next_date, fields.Date.to_date('2025-04-30'))
+
+    @freeze_time('2025-04-15')
+    def test_cron_does_not_execute_twice(self):
+        Workflow = self.env['account.move.workflow']
+        Workflow._cron_execute_recurring()
+        Workflow._cron_execute_recurring()
+        self.assertEqual(len(self._get_generated_dates()), 3)
+
+        # a scheduler moved back to already executed periods doesn't execute them again
+        self.workflow.recurrence_next_date = '2025-01-31'
+        Workflow._cron_execute_recurring()
+        self.assertEqual(self._get_generated_dates(), ['2025-01-31', '2025-02-28', '2025-03-31'])
+        self.assertEqual(self.workflow.recurrence_next_date, fields.Date.to_date('2025-04-30'))
@@ -1,3 +1,5 @@
 from . import account_move_workflow_wizard
 from . import account_move_workflow_wizard_line
-from . import account_move_workflow_wizard_details
\ No newline at end of file
+from . import account_move_workflow_wizard_details
+from . import account_move_workflow_import
+from . import account_move_workflow_run_reverse
@@ -0,0 +1,293 @@
+import csv
+import io
+import logging
+import zipfile
+from itertools import count, islice
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools.lru import LRU
+
+# Errors of the file readers, reported to the user with the line they
+# stopped at
+READ_ERRORS = (UnicodeError, ValueError, csv.Error, zipfile.BadZipFile, OSError)
+
+try:
+    from openpyxl import load_workbook
+    from openpyxl.utils.exceptions import InvalidFileException
+    READ_ERRORS += (InvalidFileException,)
+except ImportError:
+    load_workbook = None
+
+_logger = logging.getLogger(__name__)
+
+# Columns read from the file, by normalised header
+IMPORT_COLUMNS = ('partner_ref', 'amount', 'date', 'reference')
+# Partners resolved by reference kept between chunks
+PARTNER_CACHE_SIZE = 10000
+
+
+class AccountMoveWorkflowImport(models.TransientModel):
+    _name = 'account.move.workflow.import'
+    _description = 'Import Workflow Executions'
+
+    workflow_id = fields.Many2one(
+        comodel_name='account.move.workflow',
+        string='Workflow',
+        required=True,
+        domain="[('active', '=', True)]",
+    )
+    company_id = fields.Many2one(
+        comodel_name='res.company',
+        string='Company',
+        required=True,
+        default=lambda self: self.env.company,
+    )
+    file_data = fields.Binary(
+        string='File',
+        required=True,
+        help='CSV or XLSX file with one execution per row and the columns '
+             'partner_ref, amount, date and reference',
+    )
+    file_name = fields.Char(string='File Name')
+    delimiter = fields.Char(
+        string='CSV Delimiter',
+        default=',',
+        size=1,
+    )
+    chunk_size = fields.Integer(
+        string='Chunk Size',
+        required=True,
+        default=500,
+        help='Number of rows read, queued and executed together',
+    )
+    post_mode = fields.Selection(
+        selection=[
+            ('immediate', 'Post each entry when created'),
+            ('deferred', 'Post all entries at the end'),
+        ],
+        string='Posting',
+        help='Overrides the posting mode of the workflow',
+    )
+
+    def action_import(self):
+        """Read the file chunk by chunk and queue its rows on a workflow job.
+
+        The file is streamed from the filestore and only one chunk of rows
+        is held in memory at a time: partners are resolved with one search
+        per chunk through a bounded cache, and the rows are stored as queued
+        runs of the job, committed chunk by chunk. The job is only processed
+        once the whole file is queued. The rows of a consolidating workflow
+        are merged within each chunk. Rows that cannot be read or were
+        already executed are recorded as failed runs, so the rows of the job
+        are the result report of the file. When the import stops after some
+        chunks were committed, the job is cancelled."""
+        self.ensure_one()
+        if self.chunk_size <= 0:
+            raise UserError(_("The chunk size must be positive."))
+        auto_commit = not self.env.registry.in_test_mode()
+        job = self.env['account.move.workflow.job'].create({
+            'workflow_id': self.workflow_id.id,
+            'company_id': self.company_id.id,
+            'post_mode': self.post_mode,
+            'chunk_size': self.chunk_size,
+            'state': 'importing',
+        })
+        partner_cache = LRU(PARTNER_CACHE_SIZE)
+        records = self._read_file()
+        committed = False
+        try:
+            while True:
+                chunk = list(islice(records, self.chunk_size))
+                if not chunk:
+                    break
+                self._queue_chunk(job, chunk, partner_cache)
+                # release the locks taken on the execution keys of the chunk
+                if auto_commit:
+                    self.env.cr.commit()
+                    committed = True
+                # drop the runs of the chunk from the cache to keep memory flat
+                self.env.invalidate_all()
+        except Exception as e:
+            if committed:
+                self._cancel_import_job(job, e)
+            raise
+        if not job.row_count:
+            raise UserError(_("The file doesn't contain any row."))
+        job.state = 'queued'
+        job._trigger_processing()
+        # the job holds the rows now: the wizard and its uploaded file are
+        # not kept until the transient vacuum
+        self.unlink()
+        return {
+            'name': _('Queued Workflow Execution'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.move.workflow.job',
+            'view_mode': 'form',
+            'res_id': job.id,
+        }
+
+    def _read_file(self):
+        """Generator of (line number, values) for the data rows of the file,
+        ``values`` mapping the known columns to their raw cell values"""
+        with self._open_file() as stream:
+            if (self.file_name or '').lower().endswith('.xlsx'):
+                lines = self._read_xlsx(stream)
+            else:
+                lines = self._read_csv(stream)
+
+            header = self._read_line(lines, 1)
+            if not header:
+                raise UserError(_("The file is empty."))
+            columns = [str(cell or '').strip().lower().replace(' ', '_') for cell in header]
+            if 'amount' not in columns:
+                raise UserError(_("The file must have an 'amount' column."))
+            indexes = {column: columns.index(column) for column in IMPORT_COLUMNS if column in columns}
+
+            for line_number in count(2):
+                line = self._read_line(lines, line_number)
+                if line is None:
+                    break
+                if not any(cell not in (None, '') for cell in line):
+                    continue
+                yield line_number, {
+                    column: line[index] if index < len(line) else None
+                    for column, index in indexes.items()
+                }
+
+    def _read_line(self, lines, line_number):
+        """Next line of the file, None at its end"""
+        try:
+            return next(lines, None)
+        except READ_ERRORS as e:
+            raise UserError(_(
+                "The file can't be read at line %(line)s: %(error)s"
+            ) % {'line': line_number, 'error': e}) from e
+
+    def _cancel_import_job(self, job, error):
+        """Cancel ``job`` and its committed rows on a separate cursor, the
+        transaction of the import being rolled back"""
+        try:
+            with self.env.registry.cursor() as cr:
+                job = job.with_env(self.env(cr=cr))
+                job.run_ids.filtered(lambda r: r.state == 'queued').write({
+                    'state': 'failed',
+                    'error_message': _("Import interrupted: %s") % error,
+                })
+                job.state = 'cancel'
+        except Exception:
+            _logger.exception("Could not cancel the interrupted import job %s", job.id)
+
+    def _open_file(self):
+        """Binary file object on the uploaded file, opened from the
+        filestore instead of decoding the field value in memory"""
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_id', '=', self.id),
+            ('res_field', '=', 'file_data'),
+        ], limit=1)
+        if not attachment:
+            raise UserError(_("The file is empty."))
+        if attachment.store_fname:
+            return open(attachment._full_path(attachment.store_fname), 'rb')
+        # attachments stored in the database
+        return io.BytesIO(attachment.raw)
+
+    def _read_csv(self, stream):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        yield from csv.reader(stream, delimiter=self.delimiter or ',')
+
+    def _read_xlsx(self, stream):
+        if load_workbook is None:
+            raise UserError(_("The Python library openpyxl is required to import XLSX files."))
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    def _queue_chunk(self, job, chunk, partner_cache):
+        """Queue one chunk of file rows on ``job``"""
+        workflow = self.workflow_id
+        self._fetch_partners(
+            {str(values.get('partner_ref') or '').strip() for __, values in chunk},
+            partner_cache,
+        )
+
+        rows = []
+        failed_vals = []
+        for line_number, values in chunk:
+            try:
+                row = workflow._prepare_execution_row(self._prepare_import_values(values, partner_cache))
+            except (UserError, ValueError, TypeError) as e:
+                failed_vals.append({
+                    'import_line': line_number,
+                    'reference': values.get('reference') and str(values['reference']),
+                    'error_message': str(e),
+                })
+                continue
+            row['import_line'] = line_number
+            rows.append(row)
+
+        # consolidating workflows merge the rows of each chunk
+        rows, __ = workflow._consolidate_rows(rows)
+        new_rows, existing_runs = workflow._claim_execution_rows(rows)
+        queued = {id(row) for row in new_rows}
+        run_by_key = {run.execution_key: run for run in existing_runs}
+        for row in rows:
+            if id(row) in queued:
+                continue
+            run = run_by_key.get(row['execution_key'])
+            failed_vals.append({
+                'import_line': row['import_line'],
+                'partner_id': row['partner'].id,
+                'amount': row['amount'],
+                'date': row['date'],
+                'reference': row['reference'],
+                'error_message': _("Already executed by %s") % run.display_name if run
+                else _("Duplicate of a previous row of the file"),
+            })
+        job._add_rows(new_rows)
+        job._add_failed_rows(failed_vals)
+
+    def _fetch_partners(self, refs, partner_cache):
+        """Resolve the partner references missing from the cache with a
+        single search"""
+        refs = [ref for ref in refs if ref and ref not in partner_cache]
+        if not refs:
+            return
+        found = {}
+        for partner in self.env['res.partner'].search_read(
+            [('ref', 'in', refs), ('company_id', 'in', [False, self.company_id.id])],
+            ['ref'],
+            order='id',
+        ):
+            found.setdefault(partner['ref'], partner['id'])
+        for ref in refs:
+            partner_cache[ref] = found.get(ref, False)
+
+    def _prepare_import_values(self, values, partner_cache):
+        """Parameter values of the workflow execution for one file row"""
+        import_values = {
+            'company_id': self.company_id.id,
+            'amount': self._parse_amount(values.get('amount')),
+        }
+        partner_ref = str(values.get('partner_ref') or '').strip()
+        if partner_ref:
+            partner_id = partner_cache[partner_ref]
+            if not partner_id:
+                raise UserError(_("No partner found with reference %s") % partner_ref)
+            import_values['partner_id'] = partner_id
+        if values.get('date'):
+            import_values['date'] = fields.Date.to_date(values['date'])
+        if values.get('reference'):
+            import_values['reference'] = str(values['reference']).strip()
+        return import_values
+
+    @api.model
+    def _parse_amount(self, value):
+        if isinstance(value, (int, float)):
+            return float(value)
+        if not value:
+            raise UserError(_("The amount is missing."))
+        return float(str(value).strip().replace(' ', ''))
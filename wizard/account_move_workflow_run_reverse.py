@@ -0,0 +1,56 @@
+from odoo import api, fields, models, _
+
+
+class AccountMoveWorkflowRunReverse(models.TransientModel):
+    _name = 'account.move.workflow.run.reverse'
+    _description = 'Reverse Workflow Executions'
+
+    run_ids = fields.Many2many(
+        comodel_name='account.move.workflow.run',
+        string='Executions',
+        required=True,
+        default=lambda self: self._default_run_ids(),
+    )
+    run_count = fields.Integer(compute='_compute_run_count')
+    date_mode = fields.Selection(
+        selection=[
+            ('entry', 'Date of each entry'),
+            ('custom', 'Specific date'),
+        ],
+        string='Reversal Date',
+        required=True,
+        default='entry',
+    )
+    date = fields.Date(
+        string='Date',
+        default=fields.Date.context_today,
+    )
+    reason = fields.Char(string='Reason')
+
+    @api.model
+    def _default_run_ids(self):
+        if self.env.context.get('active_model') != 'account.move.workflow.run':
+            return False
+        runs = self.env['account.move.workflow.run'].browse(self.env.context.get('active_ids', []))
+        return runs.filtered(lambda r: r.state == 'done')
+
+    @api.depends('run_ids')
+    def _compute_run_count(self):
+        for wizard in self:
+            wizard.run_count = len(wizard.run_ids)
+
+    def action_reverse(self):
+        self.ensure_one()
+        workflow = self.run_ids.workflow_id[:1]
+        reversals = self.run_ids._reverse(
+            date=self.date if self.date_mode == 'custom' else None,
+            reason=self.reason,
+        )
+        # the reversal entries are the result: the wizard is not kept until
+        # the transient vacuum
+        self.unlink()
+        if not reversals:
+            return {'type': 'ir.actions.act_window_close'}
+        action = workflow._get_action_generated_moves(reversals)
+        action['name'] = _('Reversal Entries')
+        return action
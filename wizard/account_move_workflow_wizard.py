@@ -1,8 +1,6 @@
-from odoo import api, fields, models, _
+from odoo import api, fields, models, _, Command
 from odoo.exceptions import UserError, ValidationError
-from odoo.tools.safe_eval import safe_eval
 import logging
-from datetime import datetime
 
 _logger = logging.getLogger(__name__)
 
@@ -97,15 +95,10 @@ class AccountMoveWorkflowWizard(models.TransientModel):
         if self.workflow_id:
             self.currency_id = self.workflow_id.currency_id
             
-            # Limpiar líneas existentes
-            self.line_ids = [(5, 0, 0)]
-            self.details_ids = [(5, 0, 0)]
-            
+            # Limpiar líneas existentes y crearlas en una sola asignación
             template_lines = self.workflow_id.workflow_template_ids.sorted(lambda l: l.sequence)
-            wizard_line_vals = []
-            
-            for line in template_lines:
-                wizard_line_vals.append({
+            self.line_ids = [Command.clear()] + [
+                Command.create({
                     'sequence': line.sequence,
                     'template_id': line.template_id.id,
                     'workflow_template_ids': line.id,
@@ -113,9 +106,8 @@ class AccountMoveWorkflowWizard(models.TransientModel):
                     'will_execute': True,
                     'state': 'pending'
                 })
-            
-            for val in wizard_line_vals:
-                self.line_ids = [(0, 0, val)]
+                for line in template_lines
+            ]
             
             # Cargar detalles para cada template
             self._load_template_details()
@@ -134,49 +126,53 @@ class AccountMoveWorkflowWizard(models.TransientModel):
                 
             if self.amount:
                 self.price_unit = self.amount
+                self._update_details_amounts()
     
     def _load_template_details(self):
-        """Carga todas las líneas de todos los templates asociados al workflow"""
+        """Carga todas las líneas de todos los templates asociados al workflow
+        con una única búsqueda y una única asignación de comandos"""
         if not self.workflow_id or not self.line_ids:
+            self.details_ids = [Command.clear()]
             return
             
+        TemplateLine = self.env['account.move.template.line']
         templates = self.line_ids.mapped('template_id')
-        detail_vals = []
-        seq = 1
+        lines_by_template = {}
+        for tmpl_line in TemplateLine.search([('template_id', 'in', templates.ids)], order='sequence, id'):
+            lines_by_template.setdefault(tmpl_line.template_id.id, []).append(tmpl_line)
+        
+        has_tax = 'tax_ids' in TemplateLine._fields
+        has_product = 'product_id' in TemplateLine._fields
+        has_quantity = 'quantity' in TemplateLine._fields
+        has_type = 'type' in TemplateLine._fields
+        has_python_code = 'python_code' in TemplateLine._fields
         
+        detail_commands = [Command.clear()]
+        seq = 1
         for wiz_line in self.line_ids:
-            template = wiz_line.template_id
-            if not template:
-                continue
-                
-            template_lines = self.env['account.move.template.line'].search(
-                [('template_id', '=', template.id)], order='sequence'
-            )
-            
-            for tmpl_line in template_lines:
-                detail_vals.append({
-                    'wizard_id': self.id,
+            for tmpl_line in lines_by_template.get(wiz_line.template_id.id, []):
+                detail_commands.append(Command.create({
                     'wizard_line_id': wiz_line.id,
                     'name': tmpl_line.name,
                     'sequence': seq,
                     'account_id': tmpl_line.account_id.id,
                     'partner_id': tmpl_line.partner_id.id if tmpl_line.partner_id else False,
                     'move_line_type': tmpl_line.move_line_type,
-                    'tax_ids': [(6, 0, tmpl_line.tax_ids.ids)] if hasattr(tmpl_line, 'tax_ids') else False,
-                    'product_id': tmpl_line.product_id.id if hasattr(tmpl_line, 'product_id') and tmpl_line.product_id else False,
-                    'quantity': tmpl_line.quantity if hasattr(tmpl_line, 'quantity') else 1.0,
+                    'tax_ids': [Command.set(tmpl_line.tax_ids.ids)] if has_tax else False,
+                    'product_id': tmpl_line.product_id.id if has_product and tmpl_line.product_id else False,
+                    'quantity': tmpl_line.quantity if has_quantity else 1.0,
                     'amount': 0.0,  # Será calculado luego
-                    'template_line_type': tmpl_line.type if hasattr(tmpl_line, 'type') else 'input',
+                    'template_line_type': tmpl_line.type if has_type else 'input',
                     'template_line_id': tmpl_line.id,
-                    'template_python_code': tmpl_line.python_code if hasattr(tmpl_line, 'python_code') else False,
-                })
+                    'template_python_code': tmpl_line.python_code if has_python_code else False,
+                }))
                 seq += 1
                 
-        for val in detail_vals:
-            self.details_ids = [(0, 0, val)]
+        self.details_ids = detail_commands
     
     @api.onchange('amount')
     def _onchange_amount(self):
+        self._evaluate_conditions('amount')
         if self.amount:
             self.price_unit = self.amount
             
@@ -187,32 +183,53 @@ class AccountMoveWorkflowWizard(models.TransientModel):
                 self._update_details_amounts()
     
     def _update_details_amounts(self):
-        """Actualiza los montos en las líneas de detalles según la lógica del template"""
+        """Actualiza los montos en las líneas de detalles con las fórmulas de
+        las líneas de cada template"""
         if not self.details_ids:
             return
             
-        # Obtener la lógica de los templates originales para cálculos
+        details_by_line = {}
+        for detail in self.details_ids:
+            details_by_line.setdefault(detail.wizard_line_id.id, []).append(detail)
+        
+        # El plan de ejecución se obtiene una sola vez para todas las líneas
+        workflow = self.workflow_id._origin
+        steps = {step.id: step for step in workflow._get_execution_plan()} if workflow else {}
+            
         for wiz_line in self.line_ids:
-            template = wiz_line.template_id
-            if not template:
+            workflow_template = wiz_line.workflow_template_ids
+            details = details_by_line.get(wiz_line.id)
+            if not workflow_template or not details:
                 continue
+            step = steps.get(workflow_template._origin.id) or workflow_template._prepare_execution_step()
                 
-            details = self.details_ids.filtered(lambda d: d.wizard_line_id.id == wiz_line.id)
-            if not details:
+            try:
+                sequence2amount = workflow_template._compute_amounts([self.amount], step)[0]
+            except Exception as e:
+                sequence2amount = e
+            if isinstance(sequence2amount, Exception):
+                wiz_line.state = 'error'
+                wiz_line.error_message = str(sequence2amount)
                 continue
                 
-            # Buscar líneas de entrada (input) y asignar valor proporcional
-            input_details = details.filtered(lambda d: d.template_line_type == 'input')
-            if input_details and self.amount:
-                # Para simplificar, asignaremos el monto total a la primera línea de débito
-                input_details[0].amount = self.amount
-                
-                # El resto podría calcularse según la lógica del template original
-                # Aquí podríamos replicar la lógica de cálculo del template, pero
-                # por simplicidad dejamos las otras líneas en 0 por ahora
+            for detail in details:
+                detail.amount = sequence2amount.get(detail.template_line_id.sequence, 0.0)
+    
+    @api.onchange('partner_id')
+    def _onchange_partner_id(self):
+        self._evaluate_conditions('partner')
+    
+    @api.onchange('currency_id')
+    def _onchange_currency_id(self):
+        self._evaluate_conditions('currency')
+    
+    @api.onchange('date')
+    def _onchange_date(self):
+        self._evaluate_conditions('date')
     
-    @api.onchange('partner_id', 'amount', 'currency_id', 'date')
-    def _onchange_parameters(self):
+    def _evaluate_conditions(self, variable=None):
+        """Evalúa las condiciones que dependen de ``variable`` (todas si no se
+        indica), además de las que aún no se han evaluado"""
         if not self.workflow_id or not self.line_ids:
             return
             
@@ -223,20 +240,20 @@ class AccountMoveWorkflowWizard(models.TransientModel):
                 line.will_execute = True
                 line.state = 'valid'
                 continue
+            
+            workflow_template = line.workflow_template_ids
+            if (variable and line.state != 'pending'
+                    and variable not in workflow_template._get_condition_variables()):
+                continue
                 
             try:
-                result = self._safe_eval(line.condition, eval_context)
-                line.will_execute = bool(result)
+                line.will_execute = workflow_template._eval_condition(eval_context)
                 line.state = 'valid'
                 line.error_message = False
             except Exception as e:
                 line.will_execute = False
                 line.state = 'error'
                 line.error_message = str(e)
-                
-        # Actualizar detalles si es necesario
-        if self.amount:
-            self._update_details_amounts()
     
     def _get_eval_context(self):
         return {
@@ -255,118 +272,44 @@ class AccountMoveWorkflowWizard(models.TransientModel):
         
         self._validate_workflow_requirements()
         
-        templates = self.workflow_id.workflow_template_ids.sorted(lambda l: l.sequence)
-        created_moves = self.env['account.move']
-        
-        eval_context = self._get_eval_context()
-        eval_context['previous_moves'] = []
-        
-        workflow_ref = f"WORKFLOW/{self.workflow_id.code or self.workflow_id.name[:5]}/{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        if self.source_move_name:
-            workflow_ref = f"{workflow_ref}/{self.source_move_name}"
-        
-        sequence = 1
-        for line in templates:
-            try:
-                if line.condition and not self._safe_eval(line.condition, eval_context):
-                    _logger.info(f"Skipping template {line.template_id.name}: condition not met")
-                    continue
-                
-                template = line.template_id
-                
-                # Usar la compañía destino definida en el template si existe
-                target_company_id = template.target_company_id.id if hasattr(template, 'target_company_id') and template.target_company_id else self.company_id.id
-                
-                template_run_vals = {
-                    'template_id': template.id,
-                    'date': self.date,
-                    'journal_id': template.journal_id.id if template.journal_id else self.journal_id.id,
-                    'partner_id': self.partner_id.id if self.partner_id else template.partner_id.id if template.partner_id else False,
-                    'ref': self.reference,
-                    'move_type': template.move_type,
-                    'price_unit': self.price_unit or self.amount,
-                    'company_id': target_company_id,  # Usar la compañía destino
-                }
-                
-                if hasattr(template, 'date') and template.date:
-                    template_run_vals['date'] = template.date
-                
-                if line.overwrite:
-                    overwrite_dict = safe_eval(line.overwrite, eval_context)
-                    template_run_vals['overwrite'] = str(overwrite_dict)
-                
-                template_run = self.env['account.move.template.run'].create(template_run_vals)
-                _logger.info("template_run %s, %s", template_run, template_run.read())
-                
-                result = template_run.load_lines()
-                
-                if hasattr(template_run, 'line_ids') and template_run.line_ids:
-                    input_lines = template_run.line_ids.filtered(lambda l: hasattr(l, 'template_type') and l.template_type == 'input')
-                    if input_lines:
-                        input_lines[0].amount = self.amount
-                        
-                    for line in template_run.line_ids:
-                        if hasattr(line, 'price_unit'):
-                            line.price_unit = self.price_unit or self.amount
-                
-                move_result = template_run.with_context(**result.get('context', {})).generate_move()
-                
-                if move_result and move_result.get('res_id'):
-                    move = self.env['account.move'].browse(move_result['res_id'])
-                    
-                    move.write({
-                        'workflow_id': self.workflow_id.id,
-                        'workflow_sequence': sequence,
-                    })
-                    
-                    if self.price_unit or self.amount:
-                        for move_line in move.line_ids:
-                            move_line.price_unit = self.price_unit or self.amount
-                    
-                    created_moves += move
-                    eval_context['previous_moves'] = created_moves
-                    
-                sequence += 1
-                
-            except Exception as e:
-                _logger.error(f"Error executing workflow template {line.template_id.name}: {str(e)}")
-                if not line.skip_on_error:
-                    created_moves.with_context(force_delete=True).button_draft()
-                    created_moves.with_context(force_delete=True).unlink()
-                    raise UserError(_(
-                        "Error executing template %(template)s (sequence %(sequence)d): %(error)s"
-                    ) % {
-                        'template': line.template_id.name,
-                        'sequence': line.sequence,
-                        'error': str(e)
-                    })
-        
-        if len(created_moves) > 1:
-            for move in created_moves:
-                related_moves = created_moves - move
-                if related_moves:
-                    move.write({'related_move_ids': [(6, 0, related_moves.ids)]})
+        workflow = self.workflow_id
+        created_moves = workflow.execute(**self._prepare_execution_row())
         
         if not created_moves:
             raise UserError(_("No journal entries were created. Please check template conditions."))
-            
-        action = {
-            'name': _('Generated Journal Entries'),
-            'type': 'ir.actions.act_window',
-            'res_model': 'account.move',
-            'view_mode': 'list,form',
-            'domain': [('id', 'in', created_moves.ids)],
-            'context': {'create': False}
-        }
         
-        if len(created_moves) == 1:
-            action.update({
-                'view_mode': 'form',
-                'res_id': created_moves.id,
-            })
-            
+        # El asistente solo es la interfaz: se elimina con sus líneas al terminar
+        self.unlink()
+        return workflow._get_action_generated_moves(created_moves)
+
+    def action_enqueue(self):
+        """Submit the parameters to the background queue instead of
+        executing the workflow inline"""
+        self.ensure_one()
+        
+        self._validate_workflow_requirements()
+        
+        workflow = self.workflow_id
+        action = workflow.enqueue_batch([self._prepare_execution_row()])
+        self.unlink()
         return action
 
+    def _prepare_execution_row(self):
+        """Parameter row passed to the workflow execution engine"""
+        self.ensure_one()
+        return {
+            'source_move_id': self.source_move_id.id,
+            'source_move_name': self.source_move_name or '',
+            'partner_id': self.partner_id.id,
+            'amount': self.amount,
+            'price_unit': self.price_unit or self.amount,
+            'currency_id': self.currency_id.id,
+            'date': self.date,
+            'reference': self.reference,
+            'journal_id': self.journal_id.id,
+            'company_id': self.company_id.id,
+        }
+
     def _validate_workflow_requirements(self):
         self.ensure_one()
         
@@ -383,11 +326,3 @@ class AccountMoveWorkflowWizard(models.TransientModel):
             raise ValidationError("\n".join(errors))
         
         return True
-    
-    def _safe_eval(self, expr, eval_context):
-        try:
-            return safe_eval(expr, locals_dict=eval_context, nocopy=True)
-        except Exception as e:
-            raise UserError(_(
-                "Error evaluating condition: %(condition)s\nError: %(error)s"
-            ) % {'condition': expr, 'error': str(e)})
\ No newline at end of file